@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""Benchmarks for iterating through permutation spaces.
+
+Each scenario builds a permutation space, runs an operation on it, and
+reports the number of permutations per second, the peak memory, and the
+number of calls to filters and dependent parameters. The results can be
+saved as a baseline and later runs compared against it:
+
+    python3 benchmarks.py --save benchmarks.json
+    python3 benchmarks.py --compare benchmarks.json
+
+A comparison fails if the peak memory grows by more than the tolerance, or
+if the number of calls increases at all. Since the baseline may have been
+recorded on a different machine, throughput is only compared with
+--check-throughput, and then relative to the speed of a calibration loop
+that is run on both machines.
+"""
+
+import json
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from collections import Counter
+from functools import wraps
+from itertools import islice
+from time import perf_counter
+
+from permspace import PermutationSpace
+
+
+def _counted(counter, name, function):
+    """Wrap a function to count how often it is called.
+
+    Arguments:
+        counter (Counter[str]): The counter to update.
+        name (str): The key to count calls under.
+        function (Callable[..., Any]): The function.
+
+    Returns:
+        Callable[..., Any]: The wrapped function, with the same signature.
+    """
+
+    @wraps(function)
+    def wrapped(*args, **kwargs):
+        counter[name] += 1
+        return function(*args, **kwargs)
+
+    return wrapped
+
+
+def _consume(iterable):
+    """Iterate through an iterable.
+
+    Arguments:
+        iterable (Iterable[Any]): The iterable.
+
+    Returns:
+        int: The number of items.
+    """
+    count = 0
+    for _ in iterable:
+        count += 1
+    return count
+
+
+def bench_product(counter):
+    """Iterate through a large unfiltered product."""
+    pspace = PermutationSpace(
+        ['a', 'b', 'c', 'd', 'e'],
+        a=range(10),
+        b=range(10),
+        c=range(10),
+        d=range(10),
+        e=range(20),
+    )
+    return _consume(pspace)
+
+
+def _create_orthog_pspace():
+    """Create a sparse space from filter_orthog.
+
+    Returns:
+        PermutationSpace: The permutation space.
+    """
+    parameters = {f'p{i}': range(4) for i in range(16)}
+    pspace = PermutationSpace(list(parameters), **parameters)
+    pspace.filter_orthog(2, **{parameter: 0 for parameter in parameters})
+    return pspace
+
+
+def bench_orthog(counter):
+    """Iterate through a sparse space from filter_orthog."""
+    return _consume(_create_orthog_pspace())
+
+
+def count_orthog(counter):
+    """Count the evaluations of filter_orthog in a profiled pass."""
+    # the function of filter_orthog is internal, so it can only be counted by
+    # profiling, which would slow down the timed runs of bench_orthog
+    pspace = _create_orthog_pspace().set_profiling()
+    _consume(pspace)
+    for stats in pspace.profile_stats()['filters'].values():
+        counter['filter'] += stats['evaluations']
+
+
+def bench_dependent_chain(counter):
+    """Iterate through a space with a deep chain of dependent parameters."""
+    dependents = {
+        'd0': _counted(counter, 'd0', lambda a, b: a + b),
+        'd1': _counted(counter, 'd1', lambda d0, c: d0 * c),
+        'd2': _counted(counter, 'd2', lambda d1, a: d1 - a),
+        'd3': _counted(counter, 'd3', lambda d2, b: d2 + b),
+        'd4': _counted(counter, 'd4', lambda d3, c: d3 % (c + 1)),
+        'd5': _counted(counter, 'd5', lambda d4, d0: d4 + d0),
+    }
+    pspace = PermutationSpace(
+        ['a', 'b', 'c', 'd'],
+        a=range(20),
+        b=range(20),
+        c=range(20),
+        d=range(10),
+        **dependents,
+    )
+    pspace.filter(_counted(counter, 'filter', lambda d5, d: (d5 + d) % 3 != 0))
+    return _consume(pspace)
+
+
+def bench_expensive_dependent(counter):
+    """Iterate through a space with an expensive, frequently reused dependent."""
+
+    def expensive(a, b):
+        return sum(i * i for i in range(a * 100 + b))
+
+    pspace = PermutationSpace(
+        ['a', 'b', 'c', 'd'],
+        a=range(10),
+        b=range(10),
+        c=range(30),
+        d=range(30),
+        cost=_counted(counter, 'cost', expensive),
+    )
+    pspace.filter(_counted(counter, 'filter', lambda cost, c: (cost + c) % 2 == 0))
+    return _consume(pspace)
+
+
+def bench_iter_from_skip(counter):
+    """Iterate through the end of a filtered space, after a large skip."""
+    pspace = PermutationSpace(
+        ['a', 'b', 'c', 'd', 'e'],
+        a=range(20),
+        b=range(20),
+        c=range(20),
+        d=range(20),
+        e=range(20),
+    )
+    pspace.filter(_counted(counter, 'filter', lambda b, c: b != c))
+    return _consume(islice(pspace.iter_from({'a': 1}, skip=1000000), 10000))
+
+
+def bench_len(counter):
+    """Count the permutations of filtered spaces."""
+    total = 0
+    for size in range(10, 30):
+        pspace = PermutationSpace(
+            ['a', 'b', 'c', 'd', 'e'],
+            a=range(size),
+            b=range(size),
+            c=range(size),
+            d=range(size),
+            e=range(size),
+            s=_counted(counter, 's', lambda a, b: a + b),
+        )
+        pspace.filter(_counted(counter, 'filter', lambda s, c: (s + c) % 3 != 0))
+        pspace.filter(_counted(counter, 'filter', lambda d, e: d <= e))
+        total += len(pspace)
+    return total
+
+
+BENCHMARKS = {
+    'product': bench_product,
+    'orthog': bench_orthog,
+    'dependent_chain': bench_dependent_chain,
+    'expensive_dependent': bench_expensive_dependent,
+    'iter_from_skip': bench_iter_from_skip,
+    'len': bench_len,
+}
+
+CALL_COUNTERS = {
+    'orthog': count_orthog,
+}
+
+
+def calibrate(repeat=3, iterations=1000000):
+    """Measure the speed of this machine with a fixed loop.
+
+    The loop does the kind of work that dominates iteration (indexing lists,
+    hashing tuples, and calling functions), so that throughput measured on
+    different machines can be compared relative to it.
+
+    Arguments:
+        repeat (int): The number of timed runs. Defaults to 3.
+        iterations (int): The number of iterations of the loop. Defaults to
+            1000000.
+
+    Returns:
+        float: The best number of iterations per second.
+    """
+    values = list(range(100))
+    memo = {}
+    seconds = float('inf')
+    for _ in range(repeat):
+        memo.clear()
+        start = perf_counter()
+        for i in range(iterations):
+            key = (values[i % 100], values[i % 7])
+            memo[key] = memo.get(key, 0) + abs(i)
+        seconds = min(seconds, perf_counter() - start)
+    return iterations / seconds
+
+
+def run_benchmark(benchmark, repeat=3, calibration=None, count_calls=None):
+    """Run a benchmark.
+
+    The time is the best of several runs. The peak memory is measured in a
+    separate run, since tracing memory allocations slows down execution, as
+    are the calls of benchmarks that can only count them by profiling.
+
+    Arguments:
+        benchmark (Callable[[Counter[str]], int]): The benchmark.
+        repeat (int): The number of timed runs. Defaults to 3.
+        calibration (float): The iterations per second of calibrate().
+            Defaults to None, which calibrates before the benchmark.
+        count_calls (Callable[[Counter[str]], Any]): A function that counts
+            the calls of the benchmark in a separate, untimed run. Defaults to
+            None, which counts the calls during the timed runs.
+
+    Returns:
+        Dict[str, Any]: The number of permutations, the best time, the
+            permutations per second (also relative to the calibration), the
+            peak memory in bytes, and the number of calls to each counted
+            function.
+    """
+    if calibration is None:
+        calibration = calibrate(repeat=repeat)
+    seconds = float('inf')
+    for _ in range(repeat):
+        counter = Counter()
+        start = perf_counter()
+        permutations = benchmark(counter)
+        seconds = min(seconds, perf_counter() - start)
+    tracemalloc.start()
+    try:
+        benchmark(Counter())
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    if count_calls is not None:
+        counter = Counter()
+        count_calls(counter)
+    return {
+        'permutations': permutations,
+        'seconds': seconds,
+        'permutations_per_second': permutations / seconds,
+        'relative_throughput': permutations / seconds / calibration,
+        'peak_memory': peak_memory,
+        'calls': dict(sorted(counter.items())),
+    }
+
+
+def compare_results(results, baseline, tolerance=0.25, check_throughput=False):
+    """Compare benchmark results against a baseline.
+
+    Arguments:
+        results (Dict[str, Dict[str, Any]]): The results of each benchmark.
+        baseline (Dict[str, Dict[str, Any]]): The baseline results.
+        tolerance (float): The allowed relative drop in throughput and growth
+            in peak memory. Defaults to 0.25.
+        check_throughput (bool): Whether to compare the throughput, relative
+            to the calibration loop. Defaults to False.
+
+    Returns:
+        List[str]: A description of each regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if result['permutations'] != expected['permutations']:
+            regressions.append(
+                f'{name}: {result["permutations"]} permutations, expected {expected["permutations"]}'
+            )
+        if check_throughput:
+            minimum = expected['relative_throughput'] * (1 - tolerance)
+            if result['relative_throughput'] < minimum:
+                regressions.append(
+                    f'{name}: {result["relative_throughput"]:.4f} permutations per calibration iteration, '
+                    f'expected at least {minimum:.4f}'
+                )
+        maximum = expected['peak_memory'] * (1 + tolerance)
+        if result['peak_memory'] > maximum:
+            regressions.append(
+                f'{name}: peak memory of {result["peak_memory"]:,} bytes, '
+                f'expected at most {maximum:,.0f}'
+            )
+        for function, calls in result['calls'].items():
+            expected_calls = expected['calls'].get(function, 0)
+            if calls > expected_calls:
+                regressions.append(
+                    f'{name}: {calls} calls to {function}, expected at most {expected_calls}'
+                )
+    return regressions
+
+
+def main():
+    """Run the benchmarks from the command line."""
+    arg_parser = ArgumentParser(description='benchmark iterating through permutation spaces')
+    arg_parser.add_argument(
+        'benchmarks', nargs='*', metavar='benchmark',
+        help=f'benchmarks to run (default: all; choose from {", ".join(BENCHMARKS)})',
+    )
+    arg_parser.add_argument('--repeat', type=int, default=3, help='number of timed runs (default: 3)')
+    arg_parser.add_argument('--save', metavar='PATH', help='save the results as a baseline')
+    arg_parser.add_argument('--compare', metavar='PATH', help='compare the results against a baseline')
+    arg_parser.add_argument(
+        '--tolerance', type=float, default=0.25,
+        help='allowed relative drop in throughput and growth in memory (default: 0.25)',
+    )
+    arg_parser.add_argument(
+        '--check-throughput', action='store_true',
+        help='also compare the throughput, relative to a calibration loop',
+    )
+    args = arg_parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            arg_parser.error(f'unknown benchmark: {name}')
+    calibration = calibrate(repeat=args.repeat)
+    print(f'{"calibration":<20} {calibration:>31,.0f}/s')
+    results = {}
+    for name in (args.benchmarks or BENCHMARKS):
+        result = run_benchmark(
+            BENCHMARKS[name],
+            repeat=args.repeat,
+            calibration=calibration,
+            count_calls=CALL_COUNTERS.get(name),
+        )
+        results[name] = result
+        calls = ', '.join(f'{function}={count}' for function, count in result['calls'].items())
+        print(
+            f'{name:<20} {result["permutations"]:>10,} permutations '
+            f'{result["seconds"]:>8.3f}s {result["permutations_per_second"]:>12,.0f}/s '
+            f'{result["peak_memory"] / 2**20:>8.2f} MiB  {calls}'
+        )
+    if args.save:
+        with open(args.save, 'w') as fd:
+            json.dump(results, fd, indent=4, sort_keys=True)
+            fd.write('\n')
+    if args.compare:
+        with open(args.compare) as fd:
+            baseline = json.load(fd)
+        regressions = compare_results(
+            results, baseline, tolerance=args.tolerance, check_throughput=args.check_throughput,
+        )
+        for regression in regressions:
+            print(f'REGRESSION: {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
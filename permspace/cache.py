@@ -0,0 +1,384 @@
+"""Caches for the values of dependent parameters."""
+
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import partial
+from hashlib import sha256
+from inspect import getsource
+from types import CodeType
+
+
+def get_fingerprint(function, closure=False):
+    """Get a fingerprint of a function.
+
+    The fingerprint is based on the source code of the function if it is
+    available, and on its bytecode otherwise. Callable objects are based on
+    the source code of their class and on their attributes, and partial
+    functions on the function and its arguments. The values of global
+    variables are not included.
+
+    Arguments:
+        function (Callable[..., Any]): The function.
+        closure (bool): Whether to include the values of closure variables
+            (see canonical_repr). Defaults to False.
+
+    Returns:
+        str: The fingerprint.
+    """
+    if isinstance(function, partial):
+        source = (
+            get_fingerprint(function.func, closure=closure),
+            canonical_repr(function.args),
+            canonical_repr(function.keywords),
+        )
+    elif hasattr(function, '__code__'):
+        try:
+            source = getsource(function)
+        except (OSError, TypeError):
+            source = canonical_repr(function.__code__)
+    else:
+        try:
+            source = (getsource(type(function)), _object_repr(function))
+        except (OSError, TypeError):
+            source = _object_repr(function)
+    closure_values = []
+    if closure:
+        for cell in getattr(function, '__closure__', None) or ():
+            try:
+                value = cell.cell_contents
+            except ValueError:
+                value = None
+            closure_values.append(canonical_repr(value))
+    return sha256(repr((source, closure_values)).encode('utf-8')).hexdigest()
+
+
+def canonical_repr(value):
+    """Get a representation of a value that is the same in every process.
+
+    Unlike repr(), the items of sets and dictionaries are sorted, equal
+    numbers have the same representation, functions are represented by their
+    fingerprint (without their closure variables), and objects without their
+    own __repr__ are represented by their class and attributes instead of by
+    their memory address.
+
+    Arguments:
+        value (Any): The value.
+
+    Returns:
+        str: The representation.
+    """
+    if isinstance(value, bool):
+        value = int(value)
+    elif isinstance(value, complex) and value.imag == 0:
+        value = value.real
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if value is None or isinstance(value, (int, float, complex, str, bytes)):
+        return repr(value)
+    if isinstance(value, tuple):
+        return '(' + ''.join(canonical_repr(item) + ', ' for item in value) + ')'
+    if isinstance(value, list):
+        return '[' + ', '.join(canonical_repr(item) for item in value) + ']'
+    if isinstance(value, (set, frozenset)):
+        return '{' + ', '.join(sorted(canonical_repr(item) for item in value)) + '}'
+    if isinstance(value, dict):
+        return '{' + ', '.join(sorted(
+            f'{canonical_repr(key)}: {canonical_repr(item)}' for key, item in value.items()
+        )) + '}'
+    if isinstance(value, CodeType):
+        return repr((value.co_code, canonical_repr(value.co_consts), value.co_names))
+    if isinstance(value, partial) or (callable(value) and hasattr(value, '__code__')):
+        return get_fingerprint(value)
+    return _object_repr(value)
+
+
+def _object_repr(value):
+    """Get a representation of an object that is the same in every process.
+
+    Arguments:
+        value (Any): The object.
+
+    Returns:
+        str: The representation of the object if its class defines one, and
+            otherwise its class and the canonical_repr of its attributes.
+    """
+    cls = type(value)
+    if cls.__repr__ is not object.__repr__:
+        return repr(value)
+    name = f'{cls.__module__}.{cls.__qualname__}'
+    if hasattr(value, '__dict__'):
+        return f'{name}({canonical_repr(vars(value))})'
+    return f'{name}()'
+
+
+class UnboundedCache:
+    """A cache that keeps every value.
+
+    Caches map keys (the values that a dependent parameter depends on) to the
+    value of the dependent parameter. Looking up a missing key raises a
+    KeyError. Caches also count their hits, misses, and evictions.
+    """
+
+    def __init__(self):
+        """Initialize the cache."""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._values = {}
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, key):
+        try:
+            value = self._values[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self._values[key] = value
+
+    def clear(self):
+        """Remove all values from the cache."""
+        self._values.clear()
+
+    @property
+    def stats(self):
+        """Get the statistics of the cache.
+
+        Returns:
+            Dict[str, int]: The number of hits, misses, and evictions, and the
+                current size of the cache.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self),
+        }
+
+
+class LRUCache(UnboundedCache):
+    """A cache that keeps a limited number of recently used values."""
+
+    def __init__(self, maxsize):
+        """Initialize the cache.
+
+        Arguments:
+            maxsize (int): The maximum number of values to keep.
+
+        Raises:
+            ValueError: If the maximum size is not positive.
+        """
+        if maxsize < 1:
+            raise ValueError(f'maximum cache size must be positive: {maxsize}')
+        super().__init__()
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self._values.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._values[key] = value
+        self._values.move_to_end(key)
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+            self.evictions += 1
+
+
+class NoCache(UnboundedCache):
+    """A cache that keeps nothing."""
+
+    def __getitem__(self, key):
+        # keep unhashable keys an error, as with the other caches
+        hash(key)
+        self.misses += 1
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        pass
+
+
+class PrefixCache(UnboundedCache):
+    """A cache that only keeps the values for the current prefix.
+
+    Permutations are iterated in order of significance, so once the value of
+    a leading parameter changes, the earlier values will not be seen again.
+    This cache is given the positions in the key that only depend on those
+    leading parameters, and evicts everything whenever they change.
+    """
+
+    def __init__(self, prefix_positions):
+        """Initialize the cache.
+
+        Arguments:
+            prefix_positions (Sequence[int]): The positions in the key that
+                only depend on the leading parameters.
+        """
+        super().__init__()
+        self.prefix_positions = tuple(prefix_positions)
+        self._prefix = None
+
+    def __setitem__(self, key, value):
+        prefix = tuple(key[position] for position in self.prefix_positions)
+        if prefix != self._prefix:
+            self.evictions += len(self._values)
+            self._values.clear()
+            self._prefix = prefix
+        self._values[key] = value
+
+
+class SQLiteCache(UnboundedCache):
+    """A cache that persists values in an SQLite database.
+
+    Values are keyed by the name of the parameter, a fingerprint of the source
+    code of its function, and the values it depends on, so that the database
+    can be shared between different parameters and permutation spaces, and
+    values are recalculated if the function changes. The values it depends on
+    are stored by their canonical_repr, so that equal keys are found in every
+    process. Values that have been read or calculated are also kept in memory.
+
+    The database can be shared by multiple processes on the same machine.
+    Each thread of each process opens its own connection when the cache is
+    first used.
+    """
+
+    def __init__(self, path, name, function):
+        """Initialize the cache.
+
+        Arguments:
+            path (str): The path to the database file.
+            name (str): The name of the dependent parameter.
+            function (Callable[..., Any]): The function of the dependent
+                parameter.
+        """
+        super().__init__()
+        self.path = path
+        self.name = name
+        self.fingerprint = get_fingerprint(function)
+        self._preloaded = {}
+        self._local = threading.local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def __contains__(self, key):
+        if key in self._values:
+            return True
+        serialized_key = self._serialize_key(key)
+        return serialized_key in self._preloaded or self._select(serialized_key) is not None
+
+    def __len__(self):
+        cursor = self._connect().execute(
+            'SELECT COUNT(*) FROM cache WHERE name = ? AND fingerprint = ?',
+            (self.name, self.fingerprint),
+        )
+        return cursor.fetchone()[0]
+
+    def __getitem__(self, key):
+        try:
+            value = self._values[key]
+        except KeyError:
+            serialized_key = self._serialize_key(key)
+            if serialized_key in self._preloaded:
+                pickled_value = self._preloaded.pop(serialized_key)
+            else:
+                row = self._select(serialized_key)
+                if row is None:
+                    self.misses += 1
+                    raise
+                pickled_value = row[0]
+            value = pickle.loads(pickled_value)
+            self._values[key] = value
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self._values[key] = value
+        self._connect().execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+            (self.name, self.fingerprint, self._serialize_key(key), pickle.dumps(value)),
+        )
+
+    def clear(self):
+        """Remove all values from the cache, including from the database."""
+        super().clear()
+        self._preloaded.clear()
+        self._connect().execute(
+            'DELETE FROM cache WHERE name = ? AND fingerprint = ?',
+            (self.name, self.fingerprint),
+        )
+
+    def preload(self):
+        """Load all values in the database into memory.
+
+        The values are only unpickled when they are first looked up.
+        """
+        cursor = self._connect().execute(
+            'SELECT key, value FROM cache WHERE name = ? AND fingerprint = ?',
+            (self.name, self.fingerprint),
+        )
+        self._preloaded.update(cursor)
+
+    def _connect(self):
+        """Get the connection to the database for the current thread.
+
+        Connections are also reopened in forked processes, which inherit the
+        connection of the thread that forked them.
+
+        Returns:
+            sqlite3.Connection: The connection.
+        """
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            local.connection.execute('PRAGMA journal_mode=WAL')
+            local.connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'name TEXT, fingerprint TEXT, key BLOB, value BLOB, '
+                'PRIMARY KEY (name, fingerprint, key))'
+            )
+            local.pid = os.getpid()
+        return local.connection
+
+    def _select(self, serialized_key):
+        """Get a value from the database.
+
+        Arguments:
+            serialized_key (bytes): The serialized key.
+
+        Returns:
+            Optional[Tuple[bytes]]: The row with the pickled value, or None if
+                the key is not in the database.
+        """
+        cursor = self._connect().execute(
+            'SELECT value FROM cache WHERE name = ? AND fingerprint = ? AND key = ?',
+            (self.name, self.fingerprint, serialized_key),
+        )
+        return cursor.fetchone()
+
+    @staticmethod
+    def _serialize_key(key):
+        # check hashability first, as with the other caches; unlike pickle,
+        # canonical_repr does not depend on object identity, and equal
+        # numbers have the same representation
+        hash(key)
+        return canonical_repr(key).encode('utf-8')
@@ -0,0 +1,206 @@
+"""Writers and readers for exported permutation spaces."""
+
+import csv
+import json
+import mmap
+from array import array
+
+INDEX_MAGIC = b'PERMSPACE-INDEX\n'
+
+
+class CSVWriter:
+    """A writer of rows to a CSV file, with a header."""
+
+    def __init__(self, path, columns, buffer_size=1 << 20):
+        """Initialize the CSVWriter.
+
+        Arguments:
+            path (str): The path of the file.
+            columns (List[str]): The names of the columns.
+            buffer_size (int): The size of the file buffer. Defaults to 1 MiB.
+        """
+        self._file = open(path, 'w', newline='', buffering=buffer_size)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows):
+        """Write a batch of rows.
+
+        Arguments:
+            rows (List[Tuple[Any]]): The rows.
+        """
+        self._writer.writerows(rows)
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+
+class JSONLinesWriter:
+    """A writer of rows to a JSON Lines file, one object per row."""
+
+    def __init__(self, path, columns, buffer_size=1 << 20):
+        """Initialize the JSONLinesWriter.
+
+        Arguments:
+            path (str): The path of the file.
+            columns (List[str]): The names of the columns.
+            buffer_size (int): The size of the file buffer. Defaults to 1 MiB.
+        """
+        self._file = open(path, 'w', buffering=buffer_size)
+        self._columns = columns
+        self._encoder = json.JSONEncoder()
+
+    def write(self, rows):
+        """Write a batch of rows.
+
+        Arguments:
+            rows (List[Tuple[Any]]): The rows.
+        """
+        encode = self._encoder.encode
+        columns = self._columns
+        self._file.write(''.join(encode(dict(zip(columns, row))) + '\n' for row in rows))
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+
+class NPZWriter:
+    """A writer of rows to a NumPy .npz file, one array per column.
+
+    The .npz format cannot be appended to, so the columns are accumulated in
+    memory and only written when the writer is closed.
+    """
+
+    def __init__(self, path, columns):
+        """Initialize the NPZWriter.
+
+        Arguments:
+            path (str): The path of the file.
+            columns (List[str]): The names of the columns.
+        """
+        import numpy as np
+        self._np = np
+        self._path = path
+        self._columns = columns
+        self._values = [[] for _ in columns]
+
+    def write(self, rows):
+        """Write a batch of rows.
+
+        Arguments:
+            rows (List[Tuple[Any]]): The rows.
+        """
+        for values, column in zip(self._values, zip(*rows)):
+            values.extend(column)
+
+    def close(self):
+        """Write the columns to the file."""
+        np = self._np
+        arrays = {}
+        for column, values in zip(self._columns, self._values):
+            column_array = np.asarray(values)
+            if column_array.ndim != 1:
+                column_array = np.empty(len(values), dtype=object)
+                column_array[:] = values
+            arrays[column] = column_array
+        with open(self._path, 'wb') as fd:
+            np.savez(fd, **arrays)
+
+
+def get_index_typecode(size):
+    """Get the smallest unsigned array typecode for indices below a size.
+
+    Arguments:
+        size (int): The number of values.
+
+    Returns:
+        str: The typecode.
+    """
+    for typecode in 'BHIQ':
+        if size <= 1 << (8 * array(typecode).itemsize):
+            return typecode
+    raise ValueError(f'too many values to index: {size}')
+
+
+class IndexWriter:
+    """A writer of index columns to a binary file.
+
+    The file starts with a magic line and a JSON header line, padded with
+    spaces to a multiple of 8 bytes. The header contains the fingerprint of the
+    space, the number of rows, and the name and typecode of each column. The
+    columns follow, one after the other, as native unsigned integers.
+    """
+
+    def __init__(self, path, fingerprint, columns, sizes, num_rows):
+        """Initialize the IndexWriter.
+
+        Arguments:
+            path (str): The path of the file.
+            fingerprint (str): The fingerprint of the space.
+            columns (List[str]): The names of the ordered parameters.
+            sizes (List[int]): The number of values of each parameter.
+            num_rows (int): The number of rows that will be written.
+        """
+        self._typecodes = [get_index_typecode(size) for size in sizes]
+        header = json.dumps({
+            'fingerprint': fingerprint,
+            'rows': num_rows,
+            'columns': [[column, typecode] for column, typecode in zip(columns, self._typecodes)],
+        }).encode('utf-8')
+        header = INDEX_MAGIC + header + b' ' * (-(len(INDEX_MAGIC) + len(header) + 1) % 8) + b'\n'
+        self._offsets = []
+        offset = len(header)
+        for typecode in self._typecodes:
+            self._offsets.append(offset)
+            offset += num_rows * array(typecode).itemsize
+        self._file = open(path, 'wb')
+        self._file.write(header)
+        self._file.truncate(offset)
+        self._num_rows = 0
+
+    def write(self, indices):
+        """Write a batch of indices.
+
+        Arguments:
+            indices (List[Tuple[int]]): The index of each row.
+        """
+        for place, column in enumerate(zip(*indices)):
+            typecode = self._typecodes[place]
+            self._file.seek(self._offsets[place] + self._num_rows * array(typecode).itemsize)
+            self._file.write(array(typecode, column).tobytes())
+        self._num_rows += len(indices)
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+
+def load_index_columns(path):
+    """Memory-map the columns of an index file written by IndexWriter.
+
+    Arguments:
+        path (str): The path of the file.
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, memoryview]]: The header, and the
+            column of indices of each ordered parameter.
+
+    Raises:
+        ValueError: If the file is not an index file.
+    """
+    with open(path, 'rb') as fd:
+        if fd.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise ValueError(f'not a permutation space index file: {path}')
+        header_line = fd.readline()
+        header = json.loads(header_line)
+        data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(data)
+    offset = len(INDEX_MAGIC) + len(header_line)
+    columns = {}
+    for column, typecode in header['columns']:
+        length = header['rows'] * array(typecode).itemsize
+        columns[column] = view[offset:offset + length].cast(typecode)
+        offset += length
+    return header, columns
@@ -1,15 +1,36 @@
 """A more powerful itertools.product."""
 
-from collections import defaultdict, namedtuple
-from inspect import signature
-from itertools import islice
+import asyncio
+import os
+import pickle
+from bisect import bisect_left, bisect_right
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial, reduce
+from hashlib import sha256
+from inspect import Parameter as SignatureParameter, iscoroutinefunction, signature
+from itertools import product
+from operator import itemgetter, mul
+from random import Random
+from uuid import uuid4
+
+from .cache import LRUCache, NoCache, PrefixCache, SQLiteCache, UnboundedCache, canonical_repr, get_fingerprint
+from .export import CSVWriter, IndexWriter, JSONLinesWriter, NPZWriter, load_index_columns
+from .profiling import Profiler
 
 
 class PermutationSpace:
     """The space of permutations of iterables."""
 
     Parameter = namedtuple('Parameter', 'name, value, independencies, parameters')
-    FilterFunction = namedtuple('FilterFunction', 'function, parameters, min_place')
+    FilterFunction = namedtuple('FilterFunction', 'function, parameters, min_place, kind, arguments')
+    SearchStructures = namedtuple(
+        'SearchStructures',
+        'place_filters, count_key_places, count_memos, allowed_key_places, allowed_memos, cumulative_memos',
+    )
+    # allow pickling by reference to the nested classes
+    Parameter.__qualname__ = 'PermutationSpace.Parameter'
+    FilterFunction.__qualname__ = 'PermutationSpace.FilterFunction'
 
     def __init__(self, order, **kwargs):
         """Initialize the PermutationSpace.
@@ -24,11 +45,22 @@ class PermutationSpace:
         self.filters = []
         self.order = list(order)
         self.topological_order = []
-        self.cache = defaultdict(dict)
+        self._value_positions = {}
+        self.cache = {}
+        self._cache_policies = {}
+        self._lazy = False
+        self._record_type = 'namespace'
+        self._profiler = None
+        self._in_flight = {}
+        self._size = None
+        self._search = None
+        self._fingerprint = None
+        self._compiled = None
         # initialization
         self._process_parameters(kwargs)
         self._check_order()
-        self.namespace_class = self._create_namespace_class(*self.topological_order)
+        self.cache = self._create_caches()
+        self.namespace_class = self._build_namespace_class()
 
     def _process_parameters(self, parameters):
         """Parse parameters into a usable format for later.
@@ -52,6 +84,7 @@ class PermutationSpace:
                     set([parameter]),
                     set(),
                 )
+                self._value_positions[parameter] = self._create_value_positions(tuple(value))
             elif hasattr(value, '__call__'):
                 # dependent parameters
                 dependencies[parameter] = set(signature(value).parameters)
@@ -66,28 +99,74 @@ class PermutationSpace:
                 constants.add(parameter)
         # initialize the topological order with independent parameters
         self.topological_order.extend(self.order)
-        # loop through dependents until they have all been added to the topological order
-        to_delete = set(['__dummy__'])
-        while to_delete and dependencies:
-            to_delete = set()
-            for parameter, parents in dependencies.items():
-                if parents <= self._parameters.keys():
-                    to_delete.add(parameter)
-                    self._parameters[parameter] = PermutationSpace.Parameter(
-                        parameter,
-                        parameters[parameter],
-                        self._get_dependencies(dependencies[parameter]),
-                        parents,
-                    )
-                    dependents.append(parameter)
-            if not to_delete and dependencies:
-                raise ValueError(f'undefined arguments in parameters: {list(dependencies.keys())}')
-            for parameter in to_delete:
-                del dependencies[parameter]
+        # sort the dependents topologically with Kahn's algorithm
+        positions = {parameter: position for position, parameter in enumerate(dependencies)}
+        children = {parameter: [] for parameter in dependencies}
+        num_waiting = {}
+        for parameter, parents in dependencies.items():
+            num_waiting[parameter] = 0
+            for parent in parents:
+                if parent in dependencies:
+                    children[parent].append(parameter)
+                    num_waiting[parameter] += 1
+                elif parent not in self._parameters:
+                    # undefined, so this parameter will never be ready
+                    num_waiting[parameter] += 1
+        ready = deque(parameter for parameter, count in num_waiting.items() if count == 0)
+        # the dependents are ordered as if by repeatedly passing over them in
+        # the given order, adding those whose parents have already been added
+        passes = {}
+        while ready:
+            parameter = ready.popleft()
+            passes[parameter] = max(
+                (
+                    passes[parent] + (positions[parent] > positions[parameter])
+                    for parent in dependencies[parameter] if parent in dependencies
+                ),
+                default=0,
+            )
+            for child in children[parameter]:
+                num_waiting[child] -= 1
+                if num_waiting[child] == 0:
+                    ready.append(child)
+        if len(passes) < len(dependencies):
+            undefined = [parameter for parameter in dependencies if parameter not in passes]
+            raise ValueError(f'undefined arguments in parameters: {undefined}')
+        buckets = [[] for _ in range(max(passes.values(), default=-1) + 1)]
+        for parameter in dependencies:
+            buckets[passes[parameter]].append(parameter)
+        for bucket in buckets:
+            for parameter in bucket:
+                self._parameters[parameter] = PermutationSpace.Parameter(
+                    parameter,
+                    parameters[parameter],
+                    self._get_dependencies(dependencies[parameter]),
+                    dependencies[parameter],
+                )
+                dependents.append(parameter)
         # add constants and dependent parameters  to the topological order at the end
         self.topological_order.extend(sorted(constants))
         self.topological_order.extend(dependents)
 
+    @staticmethod
+    def _create_value_positions(values):
+        """Map values to their positions, for fast lookup.
+
+        Arguments:
+            values (Tuple[Any]): The values of an independent parameter.
+
+        Returns:
+            Optional[Dict[Any, int]]: The position of the first occurrence of
+                each value, or None if any value is unhashable.
+        """
+        positions = {}
+        try:
+            for position, value in enumerate(values):
+                positions.setdefault(value, position)
+        except TypeError:
+            return None
+        return positions
+
     def _check_order(self):
         """Check that the order of significance is valid.
 
@@ -124,19 +203,300 @@ class PermutationSpace:
         )
 
     def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.at(key)
         return self._parameters[key].value
 
     def __len__(self):
-        return len(list(self.__iter__()))
+        if self._size is None:
+            self._size = self._count_permutations()
+        return self._size
 
     def __iter__(self):
-        yield from self.iter_between()
+        return self.iter_between()
 
     @property
     def parameters(self):
         return {key: param.value for key, param in self._parameters.items()}
 
-    def _add_filter(self, parameters, filter_func):
+    def __reduce__(self):
+        # only pickle what cannot be cheaply derived; the namespace class
+        # cannot be pickled, and the caches are only useful in this process.
+        # The functions of filter_if() and filter_orthog() are closures, so
+        # filters are pickled by their arguments and recreated when restored
+        return (_restore_pspace, ((
+            self.order,
+            self._parameters,
+            [
+                (filter_func.parameters, filter_func.min_place, filter_func.kind, filter_func.arguments)
+                for filter_func in self.filters
+            ],
+            self.topological_order,
+            self._cache_policies,
+            self._lazy,
+            self._record_type,
+            self._profiler is not None,
+            self._size,
+            self._fingerprint,
+        ),))
+
+    def copy(self):
+        """Create a copy of the permutation space.
+
+        The copy shares the (immutable) parameters and the caches of dependent
+        parameters with this space, but has its own list of filters and its
+        own settings, which can be changed without affecting this space.
+
+        Returns:
+            PermutationSpace: The copy.
+        """
+        pspace = PermutationSpace.__new__(PermutationSpace)
+        pspace.__dict__.update(self.__dict__)
+        pspace.order = list(self.order)
+        pspace.filters = list(self.filters)
+        pspace.topological_order = list(self.topological_order)
+        pspace.cache = dict(self.cache)
+        pspace._cache_policies = dict(self._cache_policies)
+        pspace._profiler = Profiler() if self._profiler is not None else None
+        pspace._in_flight = {}
+        pspace._search = None
+        pspace._compiled = None
+        pspace.namespace_class = pspace._build_namespace_class()
+        return pspace
+
+    def with_filter(self, filter_func):
+        """Create a copy of the permutation space with an additional filter.
+
+        Arguments:
+            filter_func (Callable[[*Any], bool]): A function that returns True
+                only if a permutation is allowed (see filter()).
+
+        Returns:
+            PermutationSpace: The copy, as with copy().
+        """
+        return self.copy().filter(filter_func)
+
+    def set_cache_policy(self, policy, maxsize=None, parameters=None, path=None):
+        """Set how the values of dependent parameters are cached.
+
+        Changing the policy clears the affected caches.
+
+        Arguments:
+            policy (Union[str, Callable[[], Any]]): One of:
+                * "unbounded": keep every value. This is the default.
+                * "lru": keep the maxsize most recently used values.
+                * "none": do not cache values.
+                * "prefix": only keep the values for the current values of the
+                    most significant parameters, which will not be seen again
+                    once they change during iteration.
+                * "sqlite": keep every value, and also store them in an SQLite
+                    database at path, so they can be reused by other processes
+                    and later runs.
+                * a function that takes no arguments and returns a new cache
+                    (see permspace.cache for the interface).
+            maxsize (int): The maximum number of values to keep for each
+                parameter, for the "lru" policy.
+            parameters (Iterable[str]): The dependent parameters to apply the
+                policy to. Defaults to None, which applies to all dependent
+                parameters.
+            path (str): The path to the database, for the "sqlite" policy.
+
+        Returns:
+            PermutationSpace: The current permutation space.
+
+        Raises:
+            ValueError: If the policy is invalid, or if any of the parameters
+                are not dependent parameters.
+        """
+        if policy == 'lru' and maxsize is None:
+            raise ValueError('the "lru" cache policy requires a maxsize')
+        if policy == 'sqlite' and path is None:
+            raise ValueError('the "sqlite" cache policy requires a path')
+        if not (policy in ('unbounded', 'lru', 'none', 'prefix', 'sqlite') or callable(policy)):
+            raise ValueError(f'unknown cache policy "{policy}"')
+        if parameters is None:
+            parameters = list(self.cache)
+        for parameter in parameters:
+            if parameter not in self.cache:
+                raise ValueError(f'"{parameter}" is not a dependent parameter')
+        for parameter in parameters:
+            self._cache_policies[parameter] = (policy, maxsize, path)
+            self.cache[parameter] = self._create_cache(parameter)
+        return self
+
+    def preload_caches(self):
+        """Load all values of persistent caches into memory.
+
+        Returns:
+            PermutationSpace: The current permutation space.
+        """
+        for cache in self.cache.values():
+            if hasattr(cache, 'preload'):
+                cache.preload()
+        return self
+
+    def set_lazy(self, lazy=True):
+        """Set whether dependent parameters are calculated lazily.
+
+        Normally, every dependent parameter is calculated for every permutation.
+        If lazy, a dependent parameter is only calculated when a filter needs
+        it, or when it is accessed on the Namespace. Lazy values are not stored
+        in the Namespace but looked up from the cache on every access, and are
+        not included in comparisons and the representation of the Namespace.
+
+        Arguments:
+            lazy (bool): Whether to be lazy. Defaults to True.
+
+        Returns:
+            PermutationSpace: The current permutation space.
+
+        Raises:
+            ValueError: If any dependent parameters are asynchronous.
+        """
+        if lazy and self._get_async_dependents():
+            raise ValueError('asynchronous parameters cannot be calculated lazily')
+        self._lazy = lazy
+        self.namespace_class = self._build_namespace_class()
+        return self
+
+    def set_record_type(self, record_type):
+        """Set the type of the permutations produced by this space.
+
+        Plain tuples and dictionaries are faster to create, but do not have
+        the index_ and uniqstr_ attributes of Namespaces.
+
+        Arguments:
+            record_type (str): One of:
+                * "namespace": a Namespace. This is the default.
+                * "tuple": a tuple of the values of the parameters, in
+                    topological order (ie. ordered parameters first, then
+                    constants, then dependent parameters).
+                * "dict": a dictionary of the parameters and their values.
+                In lazy mode (see set_lazy), dependent parameters are omitted
+                from tuples and dictionaries.
+
+        Returns:
+            PermutationSpace: The current permutation space.
+
+        Raises:
+            ValueError: If the record type is invalid.
+        """
+        if record_type not in ('namespace', 'tuple', 'dict'):
+            raise ValueError(f'unknown record type "{record_type}"')
+        self._record_type = record_type
+        return self
+
+    def cache_stats(self):
+        """Get the statistics of the caches of dependent parameters.
+
+        Returns:
+            Dict[str, Dict[str, int]]: The number of hits, misses, and
+                evictions, and the current size of the cache, for each
+                dependent parameter.
+        """
+        return {parameter: cache.stats for parameter, cache in self.cache.items()}
+
+    def set_profiling(self, enabled=True):
+        """Set whether to collect statistics about filters and dependents.
+
+        When enabled, every evaluation of a filter and every calculation of a
+        dependent parameter is counted and timed, as are the number of values
+        tested against filters and the number of permutations found. Enabling
+        profiling resets the statistics; when disabled, there is no overhead.
+        Work done by other processes (for example, in map()) is not included.
+
+        Arguments:
+            enabled (bool): Whether to profile. Defaults to True.
+
+        Returns:
+            PermutationSpace: The current permutation space.
+        """
+        self._profiler = Profiler() if enabled else None
+        self._compiled = None
+        self._search = None
+        return self
+
+    def profile_stats(self):
+        """Get the statistics collected since profiling was enabled.
+
+        Filters are named by their position and kind, and the parameters they
+        depend on. Their "leaves_pruned" is the number of permutations, ignoring
+        filters, under the prefixes they rejected; since rejected values are
+        memoized, the actual number skipped may be larger.
+
+        Returns:
+            Dict[str, Any]: The number of "candidates" (values tested against
+                filters) and of permutations "yielded" (before skipping);
+                for each filter, the number of "evaluations" and
+                "rejections", the "time" in seconds, and "leaves_pruned";
+                and for each dependent parameter, the number of "calls" and
+                cache "hits", and the "time" in seconds.
+
+        Raises:
+            ValueError: If profiling is not enabled.
+        """
+        if self._profiler is None:
+            raise ValueError('profiling is not enabled; call set_profiling() first')
+        return self._profiler.as_dict()
+
+    def profile_report(self):
+        """Format the statistics collected since profiling was enabled.
+
+        Returns:
+            str: A printable report of profile_stats().
+
+        Raises:
+            ValueError: If profiling is not enabled.
+        """
+        if self._profiler is None:
+            raise ValueError('profiling is not enabled; call set_profiling() first')
+        return self._profiler.report()
+
+    def _create_caches(self):
+        """Create empty caches for all dependent parameters.
+
+        Returns:
+            Dict[str, Any]: The cache for each dependent parameter.
+        """
+        return {
+            parameter: self._create_cache(parameter)
+            for parameter in self.topological_order
+            if self._parameters[parameter].parameters
+        }
+
+    def _create_cache(self, name):
+        """Create an empty cache for a dependent parameter.
+
+        Arguments:
+            name (str): The dependent parameter.
+
+        Returns:
+            Any: The cache, according to the cache policy of the parameter.
+        """
+        policy, maxsize, path = self._cache_policies.get(name, ('unbounded', None, None))
+        if policy == 'unbounded':
+            return UnboundedCache()
+        elif policy == 'lru':
+            return LRUCache(maxsize)
+        elif policy == 'none':
+            return NoCache()
+        elif policy == 'sqlite':
+            return SQLiteCache(path, name, self._parameters[name].value)
+        elif policy == 'prefix':
+            parameter = self._parameters[name]
+            leading = set()
+            for independent in self.order:
+                if independent not in parameter.independencies:
+                    break
+                leading.add(independent)
+            return PrefixCache(
+                position for position, dependency in enumerate(sorted(parameter.parameters))
+                if self._parameters[dependency].independencies <= leading
+            )
+        else:
+            return policy()
+
+    def _add_filter(self, parameters, filter_func, kind='filter', arguments=()):
         """Add a filter to the permutation space.
 
         To efficiently skip the filtered parts of the permutation space, we
@@ -149,16 +509,24 @@ class PermutationSpace:
             parameters (Set[str]): The parameters for the filter function.
             filter_func (Callable[[*Any], bool]): A function that returns True
                 only if a permutation is allowed.
+            kind (str): The kind of filter, one of "filter", "if", or
+                "orthog". Defaults to "filter".
+            arguments (Tuple[Any]): The arguments used to create the filter,
+                which are used to compile it (see _compile_filter).
 
         Returns:
             PermutationSpace: The current permutation space.
 
         Raises:
             ValueError: If any of the parameters are not defined in the
-                permutation space.
+                permutation space, or if the filter depends on asynchronous
+                parameters.
         """
         if not parameters <= self._parameters.keys():
             raise ValueError('filter contains undefined parameters')
+        async_parameters = self._get_async_dependents().intersection(self._get_required_dependents(parameters))
+        if async_parameters:
+            raise ValueError(f'filter depends on asynchronous parameters: {sorted(async_parameters)}')
         min_place_arg = max(
             self._get_dependencies(parameters),
             key=self.order.index,
@@ -167,7 +535,12 @@ class PermutationSpace:
             filter_func,
             parameters,
             self.order.index(min_place_arg),
+            kind,
+            arguments,
         ))
+        self._size = None
+        self._search = None
+        self._fingerprint = None
         return self
 
     def filter(self, filter_func):
@@ -180,8 +553,8 @@ class PermutationSpace:
         Returns:
             PermutationSpace: The current permutation space.
         """
-        parameters = signature(filter_func).parameters.keys()
-        return self._add_filter(parameters, filter_func)
+        parameters = set(signature(filter_func).parameters.keys())
+        return self._add_filter(parameters, filter_func, 'filter', (filter_func,))
 
     def filter_if(self, antecedent_func, consequent_func):
         """Set conditions on the permutation space.
@@ -198,12 +571,16 @@ class PermutationSpace:
         Returns:
             PermutationSpace: The current permutation space.
         """
-        parameters = (
-            set(signature(antecedent_func).parameters.keys())
-            | set(signature(consequent_func).parameters.keys())
+        # the parameter sets are kept with the arguments, so that restoring a
+        # pickled space recreates the filter without inspecting signatures
+        arguments = (
+            antecedent_func,
+            consequent_func,
+            frozenset(signature(antecedent_func).parameters.keys()),
+            frozenset(signature(consequent_func).parameters.keys()),
         )
-        filter_func = self._create_filter_if_func(antecedent_func, consequent_func)
-        return self._add_filter(parameters, filter_func)
+        filter_func = self._create_filter_if_func(*arguments)
+        return self._add_filter(set(arguments[2] | arguments[3]), filter_func, 'if', arguments)
 
     def filter_orthog(self, k=1, **defaults):
         """Disallow more than k parameters to have non-default values.
@@ -220,189 +597,2414 @@ class PermutationSpace:
         """
         parameters = set(defaults.keys())
         for parameter, default in defaults.items():
-            if default not in self[parameter]:
+            if parameter in self._value_positions:
+                valid = self._find_value(
+                    default,
+                    self._value_positions[parameter],
+                    self._parameters[parameter].value,
+                ) is not None
+            else:
+                valid = default in self[parameter]
+            if not valid:
                 raise ValueError(f'{default} is not a valid default value for parameter {parameter}')
         filter_func = self._create_filter_orthog_func(k, **defaults)
-        return self._add_filter(parameters, filter_func)
+        return self._add_filter(parameters, filter_func, 'orthog', (k, defaults))
 
-    def iter_from(self, start=None, skip=0):
-        """Iterate starting from a particular assignment of values.
+    def filter_array(self, filter_func):
+        """Filter the permutation space with a vectorized function.
+
+        When used with iter_batches() or to_arrays(), the function is called
+        with NumPy arrays of the values of its parameters, and should return a
+        boolean array. Otherwise, it is called with individual values, like
+        filters from filter().
 
         Arguments:
-            start (Mapping[str, Any]): The inclusive starting assignment of values.
-            skip (int): The number of permutations to skip at the beginning.
-                Defaults to 0.
+            filter_func (Callable[[*Any], Any]): A function that returns True
+                only if a permutation is allowed.
 
-        Yields:
-            Namespace: The sequences of values through the permutation space.
+        Returns:
+            PermutationSpace: The current permutation space.
         """
-        yield from self.iter_between(start=start, skip=skip)
+        parameters = set(signature(filter_func).parameters.keys())
+        return self._add_filter(parameters, filter_func, 'array', (filter_func,))
 
-    def iter_until(self, end=None, skip=0):
-        """Iterate ending with a particular assignment of values.
+    def at(self, rank):
+        """Get the permutation at a particular position.
+
+        Without filters, this takes constant time per parameter. With filters,
+        this uses the memoized counts of permutations under each prefix.
 
         Arguments:
-            end (Mapping[str, Any]): The exclusive ending assignment of values.
-            skip (int): The number of permutations to skip at the beginning.
-                Defaults to 0.
+            rank (int): The position of the permutation. Negative positions
+                count from the end.
 
-        Yields:
-            Namespace: The sequences of values through the permutation space.
+        Returns:
+            Namespace: The permutation at that position.
+
+        Raises:
+            IndexError: If the position is out of range.
         """
-        yield from self.iter_between(end=end, skip=skip)
+        size = len(self)
+        if rank < 0:
+            rank += size
+        if not 0 <= rank < size:
+            raise IndexError(f'permutation index out of range: {rank}')
+        return self._index_to_namespace(rank, self._rank_to_index(rank))
 
-    def iter_between(self, start=None, end=None, skip=0):
-        """Iterate between two particular assignments of values.
+    def index_of(self, values):
+        """Get the position of a permutation.
+
+        This is the inverse of at().
 
         Arguments:
-            start (Mapping[str, Any]): The inclusive starting assignment of values.
-            end (Mapping[str, Any]): The exclusive ending assignment of values.
-            skip (int): The number of permutations to skip at the beginning.
-                Defaults to 0.
+            values (Mapping[str, Any]): The values of (at least) the ordered
+                parameters. Can also be a Namespace.
+
+        Returns:
+            int: The position of the permutation.
+
+        Raises:
+            ValueError: If the values are not a permutation in this space.
+        """
+        values = dict(values.items())
+        for parameter in self.order:
+            if parameter not in values:
+                raise ValueError(f'no value for parameter "{parameter}"')
+        index = self._dict_to_index({parameter: values[parameter] for parameter in self.order})
+        return self._index_to_rank(index)
+
+    def shard(self, num_shards, shard_id, strategy='contiguous'):
+        """Iterate through one of several disjoint parts of the space.
+
+        The index_ of each permutation is its position in the whole space, so
+        the results of different shards can be combined.
+
+        Arguments:
+            num_shards (int): The number of shards.
+            shard_id (int): The shard to iterate through, from 0 to
+                num_shards - 1.
+            strategy (str): How to split the space. One of:
+                * "contiguous": split the unfiltered space into equal ranges.
+                    This is the cheapest to start, but shards may be uneven
+                    if the space is filtered.
+                * "balanced": split the filtered space into equal ranges.
+                * "strided": take every num_shards-th permutation.
+                Defaults to "contiguous".
+
+        Returns:
+            Iterator[Namespace]: The permutations in the shard.
+
+        Raises:
+            ValueError: If the shard or the strategy is invalid.
+        """
+        if num_shards < 1:
+            raise ValueError(f'number of shards must be positive: {num_shards}')
+        if not 0 <= shard_id < num_shards:
+            raise ValueError(f'shard {shard_id} out of range for {num_shards} shards')
+        if strategy == 'contiguous':
+            size = reduce(mul, (len(self[parameter]) for parameter in self.order), 1)
+            start = shard_id * size // num_shards
+            end = (shard_id + 1) * size // num_shards
+            if start == end:
+                return PermutationIterator(self, None)
+            start_index = self._product_rank_to_index(start)
+            if end < size:
+                end_index = self._product_rank_to_index(end)
+            else:
+                end_index = None
+            return PermutationIterator(self, start_index, end_index, self._count_before(start_index)[0])
+        elif strategy == 'balanced':
+            size = len(self)
+            start = shard_id * size // num_shards
+            end = (shard_id + 1) * size // num_shards
+            if start == end:
+                return PermutationIterator(self, None, count=start)
+            if end < size:
+                end_index = self._rank_to_index(end)
+            else:
+                end_index = None
+            return PermutationIterator(self, self._rank_to_index(start), end_index, start)
+        elif strategy == 'strided':
+            return self._iter_strided(num_shards, shard_id)
+        else:
+            raise ValueError(f'unknown sharding strategy "{strategy}"')
+
+    def _iter_strided(self, step, offset):
+        """Iterate through every step-th permutation.
+
+        Arguments:
+            step (int): The distance between permutations.
+            offset (int): The position of the first permutation.
 
         Yields:
             Namespace: The sequences of values through the permutation space.
         """
-        if start is None:
-            curr_index = (len(self.order) - 1) * [0] + [-1]
-        else:
-            curr_index = self._dict_to_index(start)
-            curr_index[-1] -= 1
-        if end is None:
-            end_index = len(self.order) * [float('inf')]
-        else:
-            end_index = self._dict_to_index(end)
-        count = 0
-        while curr_index < end_index:
-            change_place = len(self.order) - 1
-            while change_place is not None:
-                curr_index = self._increment_index(curr_index, change_place)
-                if curr_index is None:
-                    return
-                change_place = None
-                values = self._index_to_namespace(count, curr_index)
-                for filter_func in self.filters:
-                    filter_result = filter_func.function(**{
-                        parameter: getattr(values, parameter)
-                        for parameter in filter_func.parameters
-                    })
-                    if not filter_result:
-                        if change_place is None or filter_func.min_place < change_place:
-                            change_place = filter_func.min_place
-            if curr_index < end_index:
-                count += 1
-                if skip < count:
-                    yield values
+        if not self.filters:
+            for rank in range(offset, len(self), step):
+                yield self._index_to_namespace(rank, self._product_rank_to_index(rank))
+            return
+        # unrank each permutation with the memoized counts, rather than
+        # walking through the permutations of the other shards
+        for rank in range(offset, len(self), step):
+            yield self._index_to_namespace(rank, self._rank_to_index(rank))
 
-    def _dict_to_index(self, values):
-        for parameter, value in values.items():
-            if parameter not in self._parameters:
-                raise ValueError(f'no parameter "{parameter}"')
-            if value not in self._parameters[parameter].value:
-                raise ValueError(f'{repr(value)} is not a valid value of parameter "{parameter}"')
-        result = []
-        for parameter in self.order:
-            if parameter in values:
-                result.append(self._parameters[parameter].value.index(values[parameter]))
-            else:
-                result.append(0)
-        return result
+    def sample(self, n, seed=None, replace=False):
+        """Draw random permutations uniformly from the space.
 
-    def _index_to_namespace(self, count, index):
-        result = {}
-        for parameter, i in zip(self.order, index):
-            result[parameter] = self._parameters[parameter].value[i]
-        for parameter in self.topological_order[len(self.order):]:
-            parameter = self._parameters[parameter]
-            if parameter.parameters:
-                key = tuple(result[key] for key in sorted(parameter.parameters))
-                for index, key_part in enumerate(key):
-                    try:
-                        hash(key_part)
-                    except TypeError:
-                        error_parameter = sorted(parameter.parameters)[index]
-                        raise ValueError(f'value {key_part} of parameter "{error_parameter}" is unhashable')
-                if key not in self.cache[parameter.name]:
-                    self.cache[parameter.name][key] = parameter.value(**{
-                        key: result[key] for key in parameter.parameters
-                    })
-                result[parameter.name] = self.cache[parameter.name][key]
+        Permutations are drawn from the unfiltered space and rejected if they
+        do not pass the filters. If too many are rejected, the remaining
+        permutations are drawn by position instead, using the memoized counts
+        of permutations under each prefix. Either way, the position of each
+        permutation is found with the same counts, so a filtered space is
+        counted about as much as with len().
+
+        Arguments:
+            n (int): The number of permutations to draw.
+            seed (Any): The seed for the random number generator. Defaults to
+                None, which uses a different seed every time.
+            replace (bool): Whether the same permutation can be drawn more
+                than once. Defaults to False.
+
+        Returns:
+            List[Namespace]: The permutations, in the order they were drawn.
+                Their index_ is their position in the space, as with at().
+
+        Raises:
+            ValueError: If n is negative, or larger than the space when
+                drawing without replacement.
+        """
+        if n < 0:
+            raise ValueError(f'sample size must be non-negative: {n}')
+        rng = Random(seed)
+        product_size = reduce(mul, (len(self[parameter]) for parameter in self.order), 1)
+        if not self.filters:
+            if n > product_size or (replace and n and not product_size):
+                raise ValueError(f'sample size {n} is larger than the space ({product_size})')
+            if replace:
+                ranks = [rng.randrange(product_size) for _ in range(n)]
             else:
-                result[parameter.name] = parameter.value
-        return self.namespace_class(self, count, **result)
-
-    def _increment_index(self, index, change_place=None):
-        if change_place is None:
-            change_place = len(self.order) - 1
-        for place in range(change_place, -1, -1):
-            parameter = self.order[place]
-            index[place] += 1
-            index[place + 1:] = (len(self.order) - place - 1) * [0]
-            if index[place] >= len(self._parameters[parameter].value):
-                index[place] = 0
+                ranks = rng.sample(range(product_size), n)
+            return [self._index_to_namespace(rank, self._product_rank_to_index(rank)) for rank in ranks]
+        indices = []
+        seen = set()
+        attempts = 0
+        max_attempts = 10 * n + 100
+        while len(indices) < n and attempts < max_attempts and product_size:
+            attempts += 1
+            product_rank = rng.randrange(product_size)
+            if not replace and product_rank in seen:
+                continue
+            index = self._product_rank_to_index(product_rank)
+            if self._passes_filters(index):
+                seen.add(product_rank)
+                indices.append(index)
+        # the positions are counted with the memoized cumulative counts
+        ranks = [self._count_before(index)[0] for index in indices]
+        if len(indices) < n:
+            # the space is too sparse for rejection sampling
+            size = len(self)
+            if (not replace and n > size) or not size:
+                raise ValueError(f'sample size {n} is larger than the space ({size})')
+            if replace:
+                new_ranks = [rng.randrange(size) for _ in range(n - len(indices))]
             else:
-                return index
-        return None
+                taken = sorted(ranks)
+                new_ranks = []
+                for position in rng.sample(range(size - len(taken)), n - len(taken)):
+                    # find the position-th rank that has not been taken
+                    rank = position
+                    for taken_rank in taken:
+                        if taken_rank > rank:
+                            break
+                        rank += 1
+                    new_ranks.append(rank)
+            indices.extend(self._rank_to_index(rank) for rank in new_ranks)
+            ranks.extend(new_ranks)
+        return [self._index_to_namespace(rank, index) for rank, index in zip(ranks, indices)]
+
+    def iter_spread(self):
+        """Iterate through the space from coarse to fine.
+
+        The values of each ordered parameter are visited in van der Corput
+        order (for example, 0, 4, 2, 1, 3 for five values), so that the
+        earliest values are spread out. The space is then iterated in levels:
+        level L consists of the permutations that only use the first 2**L
+        values of each parameter in that order, and which were not in an
+        earlier level. If iteration is stopped early, the permutations so far
+        therefore form a grid that evenly covers the whole space.
+
+        Yields:
+            Namespace: The permutations. Their index_ is their position in the
+                space, as with at().
+        """
+        sizes = [len(self[parameter]) for parameter in self.order]
+        if not all(sizes):
+            return
+        value_orders = [self._get_spread_order(size) for size in sizes]
+        previous = len(sizes) * [0]
+        level = 0
+        while True:
+            limits = [min(size, 1 << level) for size in sizes]
+            for positions in product(*(range(limit) for limit in limits)):
+                if all(position < limit for position, limit in zip(positions, previous)):
+                    continue
+                index = [value_order[position] for position, value_order in zip(positions, value_orders)]
+                if self._passes_filters(index):
+                    yield self._index_to_namespace(self._count_before(index)[0], index)
+            if limits == sizes:
+                return
+            previous = limits
+            level += 1
 
     @staticmethod
-    def _create_namespace_class(*parameters):
+    def _get_spread_order(size):
+        """Order positions so that each prefix is spread out.
 
-        class Namespace(namedtuple('Namespace', ['pspace_', 'index_', *parameters])):
+        Arguments:
+            size (int): The number of positions.
 
-            def __iter__(self):
-                return islice(self._fields, 2, None)
+        Returns:
+            List[int]: The positions, sorted by their bit-reversed value.
+        """
+        order = [0]
+        while len(order) < size:
+            # the bit-reversal permutation of twice as many positions
+            order = [2 * i for i in order] + [2 * i + 1 for i in order]
+        return [i for i in order if i < size]
 
-            def __str__(self):
-                import re
-                return re.sub(r'Namespace\(pspace_=<[^>]*>, ', 'Namespace(', super().__str__())
+    def _passes_filters(self, index):
+        """Check if an index passes the filters.
 
-            @property
-            def uniqstr_(self):
-                return ','.join(
-                    f'{parameter}={getattr(self, parameter)}'
-                    for parameter in self.pspace_.order
-                )
+        Arguments:
+            index (Sequence[int]): The index.
 
-            def keys(self):
-                yield from islice(self._fields, 2, None)
+        Returns:
+            bool: True if the permutation passes all filters.
+        """
+        if not self.filters:
+            return True
+        row = self._index_to_row(index)
+        for filters in self._get_search().place_filters:
+            if filters and not self._check_filters(filters, row):
+                return False
+        return True
 
-            def values(self):
-                for field in self:
-                    yield getattr(self, field)
+    def map(self, func, executor=None, chunksize=None, max_pending=None):
+        """Apply a function to every permutation, possibly in parallel.
 
-            def items(self):
-                for field in self:
-                    yield field, getattr(self, field)
+        Permutations are sent to the executor as indices, which are converted
+        to Namespaces by the worker. With a ProcessPoolExecutor, the space is
+        pickled once and sent with every chunk, but each worker process only
+        unpickles it once and keeps its own cache of dependent parameters. The
+        function, the functions of dependent parameters, and the functions
+        given to the filter methods must therefore be picklable (that is,
+        defined at the top level of a module).
 
-        return Namespace
+        Arguments:
+            func (Callable[[Namespace], Any]): The function to apply.
+            executor (concurrent.futures.Executor): The executor to submit
+                work to. Defaults to None, which applies the function in the
+                current thread.
+            chunksize (int): The number of permutations to submit at a time.
+                Defaults to None, which is 1, or 256 with a
+                ProcessPoolExecutor, since every chunk sent to a process also
+                carries the pickled space.
+            max_pending (int): The maximum number of chunks that have been
+                submitted but whose results have not been yielded. Defaults to
+                twice the number of CPUs.
 
-    @staticmethod
-    def _create_filter_if_func(antecedent_func, consequent_func):
-        antecedent_params = set(signature(antecedent_func).parameters.keys())
-        consequent_params = set(signature(consequent_func).parameters.keys())
-        def if_func(**kwargs):
-            antecedent_args = {
-                k: v for k, v in kwargs.items()
-                if k in antecedent_params
-            }
-            consequent_args = {
-                k: v for k, v in kwargs.items()
-                if k in consequent_params
-            }
-            return (
-                not antecedent_func(**antecedent_args)
-                or consequent_func(**consequent_args)
-            )
-        return if_func
+        Yields:
+            Tuple[int, Any]: The index_ of each permutation and the result of
+                the function, in order.
+        """
+        yield from self._map(func, executor, chunksize, max_pending, ordered=True)
+
+    def imap_unordered(self, func, executor=None, chunksize=None, max_pending=None):
+        """Apply a function to every permutation, yielding results as they finish.
+
+        This is the same as map(), except that the results are yielded in the
+        order they are completed.
+
+        Arguments:
+            func (Callable[[Namespace], Any]): The function to apply.
+            executor (concurrent.futures.Executor): The executor to submit
+                work to. Defaults to None, which applies the function in the
+                current thread.
+            chunksize (int): The number of permutations to submit at a time.
+                Defaults to None, which is 1, or 256 with a
+                ProcessPoolExecutor, since every chunk sent to a process also
+                carries the pickled space.
+            max_pending (int): The maximum number of chunks that have been
+                submitted but whose results have not been yielded. Defaults to
+                twice the number of CPUs.
+
+        Yields:
+            Tuple[int, Any]: The index_ of each permutation and the result of
+                the function.
+        """
+        yield from self._map(func, executor, chunksize, max_pending, ordered=False)
+
+    def _map(self, func, executor, chunksize, max_pending, ordered):
+        if chunksize is None:
+            chunksize = 256 if isinstance(executor, ProcessPoolExecutor) else 1
+        if chunksize < 1:
+            raise ValueError(f'chunk size must be positive: {chunksize}')
+        if executor is None:
+            for rank, index in enumerate(self._iter_indices(len(self.order) * [0])):
+                yield rank, func(self._index_to_namespace(rank, index))
+            return
+        if max_pending is None:
+            max_pending = 2 * (os.cpu_count() or 1)
+        if isinstance(executor, ProcessPoolExecutor):
+            submit = partial(executor.submit, _map_pickled_chunk, uuid4().hex, pickle.dumps(self), func)
+        else:
+            submit = partial(executor.submit, _map_chunk, self, func)
+        pending = deque()
+        try:
+            chunk = []
+            for rank, index in enumerate(self._iter_indices(len(self.order) * [0])):
+                chunk.append((rank, tuple(index)))
+                if len(chunk) < chunksize:
+                    continue
+                while len(pending) >= max_pending:
+                    yield from self._collect_results(pending, ordered)
+                pending.append(submit(chunk))
+                chunk = []
+            if chunk:
+                pending.append(submit(chunk))
+            while pending:
+                yield from self._collect_results(pending, ordered)
+        finally:
+            for future in pending:
+                future.cancel()
 
     @staticmethod
-    def _create_filter_orthog_func(k, **defaults):
-        def orthogonal_func(**kwargs):
-            diff_count = 0
-            for parameter, value in defaults.items():
-                if kwargs[parameter] != value:
-                    diff_count += 1
-                    if diff_count > k:
-                        return False
-            return True
-        return orthogonal_func
+    def _collect_results(pending, ordered):
+        """Wait for and yield the results of submitted chunks.
+
+        Arguments:
+            pending (Deque[Future]): The submitted chunks. Finished chunks will
+                be removed.
+            ordered (bool): If True, wait for the earliest chunk only;
+                otherwise, wait for any chunk to finish.
+
+        Yields:
+            Tuple[int, Any]: The index_ of each permutation and the result of
+                the function.
+        """
+        if ordered:
+            yield from pending.popleft().result()
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+        for future in done:
+            yield from future.result()
+
+    async def aiter(self, start=None, end=None, skip=0):
+        """Iterate asynchronously through the permutation space.
+
+        Control is given back to the event loop after every permutation.
+        Asynchronous dependent parameters are awaited (see amap()).
+
+        Arguments:
+            start (Mapping[str, Any]): The inclusive starting values, as in
+                iter_between(). Defaults to None.
+            end (Mapping[str, Any]): The exclusive ending values, as in
+                iter_between(). Defaults to None.
+            skip (int): The number of permutations to skip at the beginning.
+                Defaults to 0.
+
+        Yields:
+            Namespace: The sequences of values through the permutation space.
+        """
+        start_index = len(self.order) * [0] if start is None else self._dict_to_index(start)
+        end_index = None if end is None else self._dict_to_index(end)
+        calculations = self._get_async_calculations()
+        for count, index in enumerate(self._iter_indices(start_index, end_index)):
+            if count >= skip:
+                yield await self._aindex_to_namespace(count, index, calculations)
+            await asyncio.sleep(0)
+
+    async def amap(self, func, concurrency=8, ordered=True):
+        """Apply a coroutine function to every permutation concurrently.
+
+        Each permutation is handled by its own task, which awaits the
+        asynchronous dependent parameters before calling the function. If a
+        value is already being calculated by another task, it is awaited
+        instead of calculated again. At most concurrency tasks run at a time,
+        and the space is only enumerated as tasks finish. If the function
+        raises an exception or amap() is cancelled, enumeration stops, and
+        the running tasks are cancelled.
+
+        Arguments:
+            func (Callable[[Namespace], Awaitable[Any]]): The coroutine
+                function to apply.
+            concurrency (int): The maximum number of concurrent tasks.
+                Defaults to 8.
+            ordered (bool): Whether to return the results in the order of the
+                permutations. Otherwise, results are returned in the order they
+                finished. Defaults to True.
+
+        Returns:
+            List[Tuple[int, Any]]: The index_ of each permutation and the
+                result of the function.
+
+        Raises:
+            ValueError: If the concurrency is not positive.
+        """
+        if concurrency < 1:
+            raise ValueError(f'concurrency must be positive: {concurrency}')
+        calculations = self._get_async_calculations()
+
+        async def apply(count, index):
+            return count, await func(await self._aindex_to_namespace(count, index, calculations))
+
+        results = []
+        pending = set()
+        try:
+            for count, index in enumerate(self._iter_indices(len(self.order) * [0])):
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    results.extend(task.result() for task in done)
+                pending.add(asyncio.ensure_future(apply(count, tuple(index))))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                results.extend(task.result() for task in done)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        if ordered:
+            results.sort(key=itemgetter(0))
+        return results
+
+    def _get_async_calculations(self):
+        """Get the calculations of dependent parameters for async iteration.
+
+        Returns:
+            List[Tuple[bool, Callable[[List], Any]]]: Whether each dependent
+                parameter is asynchronous, and its calculation, in topological
+                order; or None if no dependent parameters are asynchronous.
+        """
+        async_dependents = self._get_async_dependents()
+        if not async_dependents:
+            return None
+        positions, _, dependents, _, _ = self._get_compiled()
+        return [
+            (True, self._compile_async_dependent(name, positions))
+            if name in async_dependents else (False, calculate)
+            for name, calculate in dependents.items()
+        ]
+
+    async def _aindex_to_namespace(self, count, index, calculations):
+        """Convert an index to a permutation, awaiting async parameters.
+
+        Arguments:
+            count (int): The index_ of the permutation.
+            index (Sequence[int]): The index.
+            calculations (List[Tuple[bool, Callable[[List], Any]]]): The
+                calculations from _get_async_calculations().
+
+        Returns:
+            Union[Namespace, Tuple[Any], Dict[str, Any]]: The permutation.
+        """
+        if calculations is None:
+            return self._index_to_namespace(count, index)
+        row = self._index_to_row(index)
+        for is_async, calculate in calculations:
+            if is_async:
+                await calculate(row)
+            else:
+                calculate(row)
+        return self._row_to_record(count, row)
+
+    def iter_batches(self, batch_size=65536, dependents=False):
+        """Iterate through the space in batches of NumPy arrays.
+
+        The unfiltered space is enumerated in chunks as arrays of indices.
+        Filters from filter_array() and filter_orthog() are applied to whole
+        arrays; other filters are then applied to each remaining permutation.
+        Vectorized filters that depend on dependent parameters are supported,
+        but the dependent parameters are calculated for every permutation.
+
+        Arguments:
+            batch_size (int): The number of permutations to consider at a time.
+                Batches may be smaller after filtering. Defaults to 65536.
+            dependents (bool): Whether to include dependent parameters.
+                Defaults to False.
+
+        Yields:
+            Dict[str, numpy.ndarray]: The values of each parameter, and the
+                position of each permutation as "index_".
+        """
+        import numpy as np
+        positions, _, dependent_calculations, value_lists, _ = self._get_compiled()
+        value_arrays = []
+        for values in value_lists:
+            array = np.asarray(values)
+            # only use a typed array if it holds exactly the same values
+            if array.ndim != 1 or array.dtype == object or not all(
+                type(array_value) is type(value) and array_value == value
+                for array_value, value in zip(array.tolist(), values)
+            ):
+                array = np.empty(len(values), dtype=object)
+                array[:] = list(values)
+            value_arrays.append(array)
+        radices = [len(values) for values in value_lists]
+        size = reduce(mul, radices, 1)
+        vector_filters = []
+        scalar_filters = []
+        for filter_func in self.filters:
+            if filter_func.kind == 'orthog' and filter_func.parameters <= set(self.order):
+                # whether each value deviates from the default, by position
+                k, defaults = filter_func.arguments
+                deviations = [
+                    (
+                        self.order.index(parameter),
+                        np.array([bool(value != default) for value in self[parameter]], dtype=bool),
+                    )
+                    for parameter, default in defaults.items()
+                ]
+                vector_filters.append((filter_func, (k, deviations)))
+            elif filter_func.kind == 'array':
+                vector_filters.append((filter_func, None))
+            else:
+                scalar_filters.append((
+                    self._compile_filter(filter_func, positions),
+                    [
+                        dependent_calculations[parameter]
+                        for parameter in self._get_required_dependents(filter_func.parameters)
+                    ],
+                ))
+        if dependents:
+            output_dependents = list(dependent_calculations)
+        else:
+            output_dependents = []
+        count = 0
+        for start in range(0, size, batch_size):
+            ranks = np.arange(start, min(start + batch_size, size))
+            indices = []
+            for radix in reversed(radices):
+                ranks, place_indices = np.divmod(ranks, radix)
+                indices.append(place_indices)
+            indices.reverse()
+            columns = {
+                parameter: array[place_indices]
+                for parameter, array, place_indices in zip(self.order, value_arrays, indices)
+            }
+            batch_rows = None
+
+            def get_column(parameter):
+                nonlocal batch_rows
+                if parameter not in columns:
+                    if batch_rows is None:
+                        batch_rows = [self._index_to_row(index) for index in zip(*indices)]
+                    column = np.empty(len(batch_rows), dtype=object)
+                    column[:] = [
+                        self._calculate_row(row, parameter, dependent_calculations)
+                        for row in batch_rows
+                    ]
+                    columns[parameter] = column
+                return columns[parameter]
+
+            mask = np.ones(len(indices[0]), dtype=bool)
+            for filter_func, orthog_tables in vector_filters:
+                if orthog_tables is not None:
+                    k, deviations = orthog_tables
+                    num_deviations = sum(
+                        table[indices[place]].astype(int)
+                        for place, table in deviations
+                    )
+                    mask &= (num_deviations <= k)
+                else:
+                    mask &= np.asarray(filter_func.function(**{
+                        parameter: get_column(parameter) for parameter in filter_func.parameters
+                    }), dtype=bool)
+            survivors = np.flatnonzero(mask)
+            if scalar_filters:
+                survivors = np.array([
+                    survivor for survivor in survivors
+                    if self._check_filters(
+                        scalar_filters,
+                        self._index_to_row(index[survivor] for index in indices),
+                    )
+                ], dtype=int)
+            if not len(survivors):
+                continue
+            batch = {
+                parameter: column[survivors]
+                for parameter, column in columns.items()
+                if parameter in self.order
+            }
+            for parameter in output_dependents:
+                batch[parameter] = get_column(parameter)[survivors]
+            batch['index_'] = np.arange(count, count + len(survivors))
+            count += len(survivors)
+            yield batch
+
+    def to_arrays(self, dependents=False):
+        """Get the whole space as NumPy arrays.
+
+        Arguments:
+            dependents (bool): Whether to include dependent parameters.
+                Defaults to False.
+
+        Returns:
+            Dict[str, numpy.ndarray]: The values of each parameter, and the
+                position of each permutation as "index_".
+        """
+        import numpy as np
+        batches = list(self.iter_batches(dependents=dependents))
+        if not batches:
+            batches = [{
+                parameter: np.asarray(self[parameter])[:0] for parameter in self.order
+            }]
+            batches[0]['index_'] = np.arange(0)
+        return {
+            key: np.concatenate([batch[key] for batch in batches])
+            for key in batches[0]
+        }
+
+    def export(self, path, format='csv', columns=None, batch_size=65536, dependents=False):
+        """Write the permutations of the space to a file.
+
+        Permutations are written in batches, as rows of values. The indices
+        of the ordered parameters are also written to a binary file at path +
+        ".index", which can be memory-mapped with load_index().
+
+        Arguments:
+            path (str): The path of the file.
+            format (str): The format of the file: "csv", "jsonl" (one JSON
+                object per line), or "npz" (NumPy arrays, which are only
+                written at the end). Defaults to "csv".
+            columns (Sequence[str]): The parameters to write. Defaults to None,
+                which writes the ordered parameters and constants (and
+                dependent parameters, if dependents is True) in topological
+                order.
+            batch_size (int): The number of permutations to write at a time.
+                Defaults to 65536.
+            dependents (bool): Whether to include dependent parameters in the
+                default columns. Defaults to False.
+
+        Returns:
+            int: The number of permutations written.
+
+        Raises:
+            ValueError: If the format or the batch size is invalid, or if any
+                column is not a parameter.
+        """
+        writer_classes = {'csv': CSVWriter, 'jsonl': JSONLinesWriter, 'npz': NPZWriter}
+        if format not in writer_classes:
+            raise ValueError(f'unknown export format: {format}')
+        if batch_size < 1:
+            raise ValueError(f'batch size must be positive: {batch_size}')
+        if columns is None:
+            columns = [
+                parameter for parameter in self.topological_order
+                if dependents or not self._parameters[parameter].parameters
+            ]
+        else:
+            columns = list(columns)
+            for column in columns:
+                if column not in self._parameters:
+                    raise ValueError(f'no parameter "{column}"')
+        positions, base_row, dependent_calculations, value_lists, _ = self._get_compiled()
+        calculations = [dependent_calculations[parameter] for parameter in self._get_required_dependents(columns)]
+        num_places = len(self.order)
+        get_values = self._compile_getter([positions[column] for column in columns])
+        writer = writer_classes[format](path, columns)
+        index_writer = IndexWriter(
+            path + '.index',
+            self.fingerprint,
+            self.order,
+            [len(self[parameter]) for parameter in self.order],
+            len(self),
+        )
+        count = 0
+        try:
+            rows = []
+            indices = []
+            for index in self._iter_indices(num_places * [0]):
+                row = base_row.copy()
+                row[:num_places] = [values[i] for values, i in zip(value_lists, index)]
+                for calculate in calculations:
+                    calculate(row)
+                rows.append(get_values(row))
+                indices.append(tuple(index))
+                if len(rows) >= batch_size:
+                    writer.write(rows)
+                    index_writer.write(indices)
+                    count += len(rows)
+                    rows = []
+                    indices = []
+            if rows:
+                writer.write(rows)
+                index_writer.write(indices)
+                count += len(rows)
+        finally:
+            index_writer.close()
+            writer.close()
+        return count
+
+    def load_index(self, path):
+        """Memory-map the indices of the permutations written by export().
+
+        Arguments:
+            path (str): The path of the exported file (not the ".index" file).
+
+        Returns:
+            Dict[str, memoryview]: For each ordered parameter, the position of
+                its value in each permutation, in the order they were written.
+                The values can be looked up with pspace[parameter][position].
+
+        Raises:
+            ValueError: If the file was exported from a different space, or
+                if the values of the ordered parameters or the filters have
+                changed since.
+        """
+        header, columns = load_index_columns(path + '.index')
+        if header['fingerprint'] != self.fingerprint:
+            raise ValueError('exported file does not match the permutation space and filters')
+        return columns
+
+    def iter_from(self, start=None, skip=0):
+        """Iterate starting from a particular assignment of values.
+
+        Arguments:
+            start (Mapping[str, Any]): The inclusive starting assignment of values.
+            skip (int): The number of permutations to skip at the beginning.
+                Defaults to 0.
+
+        Returns:
+            PermutationIterator: The sequences of values through the
+                permutation space.
+        """
+        return self.iter_between(start=start, skip=skip)
+
+    def iter_until(self, end=None, skip=0):
+        """Iterate ending with a particular assignment of values.
+
+        Arguments:
+            end (Mapping[str, Any]): The exclusive ending assignment of values.
+            skip (int): The number of permutations to skip at the beginning.
+                Defaults to 0.
+
+        Returns:
+            PermutationIterator: The sequences of values through the
+                permutation space.
+        """
+        return self.iter_between(end=end, skip=skip)
+
+    def iter_between(self, start=None, end=None, skip=0):
+        """Iterate between two particular assignments of values.
+
+        Arguments:
+            start (Mapping[str, Any]): The inclusive starting assignment of values.
+            end (Mapping[str, Any]): The exclusive ending assignment of values.
+            skip (int): The number of permutations to skip at the beginning.
+                Defaults to 0.
+
+        Returns:
+            PermutationIterator: The sequences of values through the
+                permutation space.
+        """
+        if start is None:
+            start_index = len(self.order) * [0]
+        else:
+            start_index = self._dict_to_index(start)
+        if end is None:
+            end_index = None
+        else:
+            end_index = self._dict_to_index(end)
+        return PermutationIterator(self, start_index, end_index, skip=skip)
+
+    def resume(self, token):
+        """Resume iteration from a checkpoint.
+
+        Arguments:
+            token (Dict[str, Any]): A checkpoint from
+                PermutationIterator.checkpoint().
+
+        Returns:
+            PermutationIterator: An iterator that continues where the
+                checkpointed iterator left off, including its index_.
+
+        Raises:
+            ValueError: If the checkpoint is from a different permutation space
+                or from different filters.
+        """
+        if token['fingerprint'] != self.fingerprint:
+            raise ValueError('checkpoint does not match the permutation space and filters')
+        return PermutationIterator(
+            self,
+            token['start'],
+            token['end'],
+            count=token['count'],
+            skip=token['skip'],
+        )
+
+    @property
+    def fingerprint(self):
+        """A fingerprint of the ordered parameters and the filters.
+
+        The fingerprint is the same in every process. It includes the values
+        of the ordered parameters; the kind, parameters, and arguments of each
+        filter; and the values of constants and the functions of dependent
+        parameters that the filters depend on.
+
+        Returns:
+            str: The fingerprint.
+        """
+        if self._fingerprint is None:
+            filter_parameters = set().union(*(filter_func.parameters for filter_func in self.filters))
+            self._fingerprint = sha256(repr((
+                [(parameter, canonical_repr(self[parameter])) for parameter in self.order],
+                [
+                    (
+                        filter_func.kind,
+                        sorted(filter_func.parameters),
+                        [
+                            get_fingerprint(argument, closure=True) if callable(argument)
+                            else canonical_repr(argument)
+                            for argument in filter_func.arguments
+                        ],
+                    )
+                    for filter_func in self.filters
+                ],
+                [
+                    (parameter, canonical_repr(self[parameter]))
+                    for parameter in sorted(filter_parameters.difference(self.order))
+                    if not self._parameters[parameter].parameters
+                ],
+                [
+                    (parameter, get_fingerprint(self[parameter], closure=True))
+                    for parameter in self._get_required_dependents(filter_parameters)
+                ],
+            )).encode('utf-8')).hexdigest()
+        return self._fingerprint
+
+    def iter_excluding(self, completed):
+        """Iterate through the permutations that have not been completed.
+
+        Completed permutations can be given as index vectors (see
+        index_vectors()), as a bitmap over positions, or as another
+        permutation space. Completed regions are skipped in bulk: with index
+        vectors or another space, any prefix whose permutations have all been
+        completed is skipped without visiting them, and any prefix with no
+        completed permutations is iterated without checking them; with a
+        bitmap, runs of completed positions are skipped by random access.
+
+        Arguments:
+            completed (Union[Iterable[Sequence[int]], bytes, PermutationSpace]):
+                The completed permutations. A bitmap (bytes, bytearray, or
+                memoryview) has bit r % 8 of byte r // 8 set if the permutation
+                at position r has been completed. Index vectors and
+                permutations of another space that are not in this space are
+                ignored.
+
+        Yields:
+            Namespace: The permutations that have not been completed. Their
+                index_ is their position in the whole space, as with at().
+
+        Raises:
+            ValueError: If an index vector is out of range, or if the other
+                space has different ordered parameters.
+        """
+        if isinstance(completed, PermutationSpace):
+            yield from self.difference(completed)
+        elif isinstance(completed, (bytes, bytearray, memoryview)):
+            for start, stop in self._iter_bitmap_runs(completed, len(self)):
+                indices = self._iter_indices(self._rank_to_index(start))
+                for rank, index in zip(range(start, stop), indices):
+                    yield self._index_to_namespace(rank, index)
+        else:
+            yield from self._iter_uncovered(self._count_covered(completed))
+
+    def difference(self, other):
+        """Iterate through the permutations that are not in another space.
+
+        This is meant for extending a sweep, for example by adding values to
+        an ordered parameter or relaxing a filter. Permutations are compared
+        by the values of their ordered parameters. The prefix trees of the two
+        spaces are walked together, and the number of permutations under each
+        prefix that are in both spaces is counted and memoized in the same way
+        as the size of the space (see _count_common), so whole prefixes that
+        are covered by the other space are skipped without enumerating them.
+
+        Arguments:
+            other (PermutationSpace): The space with the completed
+                permutations. It must have the same ordered parameters, but
+                they may be in a different order, in which case the other
+                space is rebuilt in the order of this space.
+
+        Yields:
+            Namespace: The permutations of this space that are not in the
+                other space. Their index_ is their position in this space.
+
+        Raises:
+            ValueError: If the other space has different ordered parameters.
+        """
+        if set(other.order) != set(self.order):
+            raise ValueError(
+                f'spaces have different ordered parameters: {sorted(self.order)} and {sorted(other.order)}'
+            )
+        if other.order != self.order:
+            other = other._reorder(self.order)
+        # map the positions of values in this space to the other space
+        value_maps = [
+            [
+                other._find_value(value, other._value_positions[parameter], other[parameter])
+                for value in self[parameter]
+            ]
+            for parameter in self.order
+        ]
+        num_places = len(self.order)
+        if num_places == 0:
+            return
+        value_lists = self._get_compiled()[3]
+        index = num_places * [0]
+        row = self._get_compiled()[1].copy()
+        other_values = other._get_compiled()[3]
+        other_index = num_places * [0]
+        other_row = other._get_compiled()[1].copy()
+        memo = {}
+
+        def visit(place, rank):
+            # the prefix is in both spaces; only visit the children that are
+            # not completely covered, which are the same for every prefix
+            # with the same memoization keys
+            key = (
+                'children',
+                place,
+                tuple(index[prev_place] for prev_place in self._get_search().count_key_places[place]),
+                tuple(other_index[prev_place] for prev_place in other._get_search().count_key_places[place]),
+            )
+            if key not in memo:
+                memo[key] = self._get_uncovered_children(
+                    place, index, row, other, other_index, other_row, value_maps, memo,
+                )
+            for offset, i, j, count, num_covered in memo[key]:
+                index[place] = i
+                row[place] = value_lists[place][i]
+                if num_covered == 0:
+                    # nothing under this prefix has been completed
+                    start_index = index[:place + 1] + (num_places - place - 1) * [0]
+                    indices = self._iter_indices(start_index)
+                    for subrank, subindex in zip(range(rank + offset, rank + offset + count), indices):
+                        yield self._index_to_namespace(subrank, subindex)
+                else:
+                    other_index[place] = j
+                    other_row[place] = other_values[place][j]
+                    yield from visit(place + 1, rank + offset)
+
+        yield from visit(0, 0)
+
+    def _get_uncovered_children(self, place, index, row, other, other_index, other_row, value_maps, memo):
+        """Find the children of a prefix that are not completely in another space.
+
+        Arguments:
+            place (int): The number of places in the prefix, which must be in
+                both spaces.
+            index (List[int]): The index in this space, of which only the
+                prefix is used. Places at and after the prefix will be
+                modified.
+            row (List[Any]): The values of the prefix in this space. Values at
+                and after the prefix will be modified.
+            other (PermutationSpace): The other space, in the same order.
+            other_index (List[int]): The index of the prefix in the other
+                space. Places at and after the prefix will be modified.
+            other_row (List[Any]): The values of the prefix in the other space.
+                Values at and after the prefix will be modified.
+            value_maps (List[List[Optional[int]]]): For each place, the
+                position in the other space of each value in this space, or
+                None if the other space does not have the value.
+            memo (Dict[Tuple, Any]): The memoized counts (see _count_common).
+
+        Returns:
+            List[Tuple[int, int, Optional[int], int, int]]: For each child
+                with permutations that are not in the other space, the number
+                of permutations under the earlier children, the position of
+                its value in both spaces, the number of permutations under it,
+                and how many of them are also in the other space.
+        """
+        values = self._get_compiled()[3][place]
+        other_values = other._get_compiled()[3][place]
+        other_allowed = other._get_allowed(place, other_index, other_row)
+        value_map = value_maps[place]
+        children = []
+        offset = 0
+        for i in self._get_allowed(place, index, row):
+            index[place] = i
+            row[place] = values[i]
+            count = self._count_below(place + 1, index, row)
+            j = value_map[i]
+            num_covered = 0
+            if j is not None:
+                position = bisect_left(other_allowed, j)
+                if position < len(other_allowed) and other_allowed[position] == j:
+                    other_index[place] = j
+                    other_row[place] = other_values[j]
+                    num_covered = self._count_common(
+                        place + 1, index, row, other, other_index, other_row, value_maps, memo,
+                    )
+            if num_covered < count:
+                children.append((offset, i, j, count, num_covered))
+            offset += count
+        return children
+
+    def _reorder(self, order):
+        """Create a space with the same permutations in a different order.
+
+        Arguments:
+            order (Sequence[str]): The new order of the ordered parameters.
+
+        Returns:
+            PermutationSpace: The new space.
+        """
+        pspace = PermutationSpace(
+            order,
+            **{name: parameter.value for name, parameter in self._parameters.items()},
+        )
+        for filter_func in self.filters:
+            pspace._add_filter(
+                filter_func.parameters,
+                filter_func.function,
+                filter_func.kind,
+                filter_func.arguments,
+            )
+        return pspace
+
+    def _count_common(self, place, index, row, other, other_index, other_row, value_maps, memo):
+        """Count the permutations with a prefix that are also in another space.
+
+        The other space must have the same order. Since the permutations under
+        a prefix of either space only depend on the earlier values that later
+        filters depend on (see _count_below), the counts are memoized by (the
+        indices of) those values in both spaces.
+
+        Arguments:
+            place (int): The number of places in the prefix.
+            index (List[int]): The index in this space, of which only the
+                prefix is used. Places after the prefix will be modified.
+            row (List[Any]): The values of the prefix in this space. Values
+                after the prefix will be modified.
+            other (PermutationSpace): The other space.
+            other_index (List[int]): The index of the prefix in the other
+                space. Places after the prefix will be modified.
+            other_row (List[Any]): The values of the prefix in the other space.
+                Values after the prefix will be modified.
+            value_maps (List[List[Optional[int]]]): For each place, the
+                position in the other space of each value in this space, or
+                None if the other space does not have the value.
+            memo (Dict[Tuple, int]): The memoized counts.
+
+        Returns:
+            int: The number of permutations that start with the prefix and
+                are in both spaces.
+        """
+        if place == len(self.order):
+            return 1
+        key = (
+            place,
+            tuple(index[prev_place] for prev_place in self._get_search().count_key_places[place]),
+            tuple(other_index[prev_place] for prev_place in other._get_search().count_key_places[place]),
+        )
+        if key not in memo:
+            total = 0
+            values = self._get_compiled()[3][place]
+            other_values = other._get_compiled()[3][place]
+            other_allowed = other._get_allowed(place, other_index, other_row)
+            value_map = value_maps[place]
+            for i in self._get_allowed(place, index, row):
+                j = value_map[i]
+                if j is None:
+                    continue
+                position = bisect_left(other_allowed, j)
+                if position == len(other_allowed) or other_allowed[position] != j:
+                    continue
+                index[place] = i
+                row[place] = values[i]
+                other_index[place] = j
+                other_row[place] = other_values[j]
+                total += self._count_common(
+                    place + 1, index, row, other, other_index, other_row, value_maps, memo,
+                )
+            memo[key] = total
+        return memo[key]
+
+    def _count_covered(self, indices):
+        """Count the completed permutations under each prefix.
+
+        Arguments:
+            indices (Iterable[Sequence[int]]): The index vectors of completed
+                permutations. Duplicates and indices that do not pass the
+                filters are ignored.
+
+        Returns:
+            Dict[Tuple[int], int]: The number of completed permutations that
+                start with each prefix (including complete indices).
+
+        Raises:
+            ValueError: If an index vector is out of range.
+        """
+        sizes = [len(self[parameter]) for parameter in self.order]
+        check_filters = any(self._get_search().place_filters)
+        seen = set()
+        covered = {}
+        for index in indices:
+            index = tuple(index)
+            if index in seen:
+                continue
+            seen.add(index)
+            if len(index) != len(sizes) or not all(0 <= i < size for i, size in zip(index, sizes)):
+                raise ValueError(f'index vector out of range: {index}')
+            if check_filters and not self._passes_filters(index):
+                continue
+            for place in range(1, len(index) + 1):
+                prefix = index[:place]
+                covered[prefix] = covered.get(prefix, 0) + 1
+        return covered
+
+    def _iter_uncovered(self, covered):
+        """Iterate through the permutations that have not been completed.
+
+        Arguments:
+            covered (Dict[Tuple[int], int]): The number of completed
+                permutations under each prefix, from _count_covered().
+
+        Yields:
+            Namespace: The permutations that have not been completed.
+        """
+        num_places = len(self.order)
+        if num_places == 0:
+            return
+        value_lists = self._get_compiled()[3]
+        index = num_places * [0]
+        row = self._get_compiled()[1].copy()
+        rank = 0
+
+        def visit(place):
+            nonlocal rank
+            for i in self._get_allowed(place, index, row):
+                index[place] = i
+                row[place] = value_lists[place][i]
+                prefix = tuple(index[:place + 1])
+                count = self._count_below(place + 1, index, row)
+                num_covered = covered.get(prefix, 0)
+                if num_covered == 0:
+                    # nothing under this prefix has been completed
+                    start_index = list(prefix) + (num_places - place - 1) * [0]
+                    indices = self._iter_indices(start_index)
+                    for subrank, subindex in zip(range(rank, rank + count), indices):
+                        yield self._index_to_namespace(subrank, subindex)
+                elif num_covered < count:
+                    # the ranks are counted while visiting the subtree
+                    yield from visit(place + 1)
+                    continue
+                rank += count
+
+        yield from visit(0)
+
+    @staticmethod
+    def _iter_bitmap_runs(bitmap, size):
+        """Find the runs of unset bits in a bitmap.
+
+        Arguments:
+            bitmap (bytes): The bitmap, with bit r % 8 of byte r // 8 for r.
+                Bits beyond the end of the bitmap are unset.
+            size (int): The number of bits to consider.
+
+        Yields:
+            Tuple[int, int]: The start (inclusive) and end (exclusive) of each
+                run of unset bits.
+        """
+        view = memoryview(bitmap).cast('B')
+        rank = 0
+        while rank < size:
+            # skip over set bits, a byte at a time where possible
+            while rank < size and rank >> 3 < len(view):
+                byte = view[rank >> 3]
+                if byte == 0xFF and not rank & 7:
+                    rank += 8
+                elif byte >> (rank & 7) & 1:
+                    rank += 1
+                else:
+                    break
+            start = min(rank, size)
+            # find the end of the unset bits, a byte at a time where possible
+            while rank < size:
+                if rank >> 3 >= len(view):
+                    rank = size
+                    break
+                byte = view[rank >> 3]
+                if byte == 0 and not rank & 7:
+                    rank += 8
+                elif byte >> (rank & 7) & 1:
+                    break
+                else:
+                    rank += 1
+            stop = min(rank, size)
+            if start < stop:
+                yield start, stop
+
+    def _iter_indices(self, start_index, end_index=None):
+        """Search for the indices of permutations, counting them if profiling.
+
+        Arguments:
+            start_index (List[int]): The inclusive starting index.
+            end_index (List[int]): The exclusive ending index. Defaults to
+                None, which continues to the end of the space.
+
+        Returns:
+            Iterator[List[int]]: The index of each permutation. The same list
+                is modified and yielded each time.
+        """
+        indices = self._search_indices(start_index, end_index)
+        if self._profiler is not None:
+            return self._profiler.count_yielded(indices)
+        return indices
+
+    def _search_indices(self, start_index, end_index=None):
+        """Iterate through the indices of permutations that pass the filters.
+
+        The space is enumerated depth-first, in order of significance. At each
+        place, only the values that pass the filters that can be decided there
+        are considered (see _get_allowed), so a rejected prefix is skipped as a
+        whole, without calculating any values of the permutations under it.
+
+        Arguments:
+            start_index (List[int]): The inclusive starting index.
+            end_index (List[int]): The exclusive ending index. Defaults to
+                None, which continues to the end of the space.
+
+        Yields:
+            List[int]: The index of each permutation. The same list is
+                modified and yielded each time.
+        """
+        num_places = len(self.order)
+        if num_places == 0:
+            return
+        value_lists = self._get_compiled()[3]
+        row = self._get_compiled()[1].copy()
+        index = list(start_index)
+        # the allowed indices at each place, and how far through them we are
+        allowed = num_places * [None]
+        pointers = num_places * [0]
+        # whether the prefix so far matches the start/end index
+        at_start = True
+        at_end = (num_places + 1) * [end_index is not None]
+        place = 0
+        allowed[0] = self._get_allowed(0, index, row)
+        pointers[0] = bisect_left(allowed[0], start_index[0])
+        while True:
+            if pointers[place] >= len(allowed[place]):
+                # this place is exhausted; backtrack to the previous place
+                if place == 0:
+                    return
+                place -= 1
+                pointers[place] += 1
+                at_start = False
+                continue
+            i = allowed[place][pointers[place]]
+            index[place] = i
+            if at_start and i != start_index[place]:
+                at_start = False
+            if at_end[place]:
+                if i > end_index[place]:
+                    return
+                at_end[place + 1] = (i == end_index[place])
+            else:
+                at_end[place + 1] = False
+            row[place] = value_lists[place][i]
+            if place < num_places - 1:
+                place += 1
+                allowed[place] = self._get_allowed(place, index, row)
+                if at_start:
+                    pointers[place] = bisect_left(allowed[place], start_index[place])
+                else:
+                    pointers[place] = 0
+                continue
+            if at_end[num_places]:
+                return
+            yield index
+            pointers[place] += 1
+            at_start = False
+
+    def index_vectors(self, values_list):
+        """Convert assignments of values to index vectors.
+
+        An index vector holds the position of the value of each ordered
+        parameter among the values of that parameter. Ordered parameters
+        without a value are given the first value, as with iter_from().
+
+        Arguments:
+            values_list (Iterable[Mapping[str, Any]]): The assignments of
+                values.
+
+        Returns:
+            List[Tuple[int]]: The index vector of each assignment.
+
+        Raises:
+            ValueError: If any parameter or value is not in the space.
+        """
+        return [tuple(index) for index in self._dicts_to_indices(values_list)]
+
+    def _dict_to_index(self, values):
+        return self._dicts_to_indices([values])[0]
+
+    def _dicts_to_indices(self, values_list):
+        lookups = [
+            (parameter, self._value_positions[parameter], self._parameters[parameter].value)
+            for parameter in self.order
+        ]
+        results = []
+        for values in values_list:
+            for parameter, value in values.items():
+                if parameter not in self._parameters:
+                    raise ValueError(f'no parameter "{parameter}"')
+                if parameter not in self._value_positions and value not in self._parameters[parameter].value:
+                    raise ValueError(f'{repr(value)} is not a valid value of parameter "{parameter}"')
+            result = []
+            for parameter, positions, parameter_values in lookups:
+                if parameter not in values:
+                    result.append(0)
+                    continue
+                position = self._find_value(values[parameter], positions, parameter_values)
+                if position is None:
+                    raise ValueError(f'{repr(values[parameter])} is not a valid value of parameter "{parameter}"')
+                result.append(position)
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _find_value(value, positions, values):
+        """Find the position of a value of an independent parameter.
+
+        Arguments:
+            value (Any): The value to find.
+            positions (Optional[Dict[Any, int]]): The positions of the values,
+                or None if they are unhashable.
+            values (Tuple[Any]): The values, for unhashable values.
+
+        Returns:
+            Optional[int]: The position of the value, or None if it is not
+                a value of the parameter.
+        """
+        if positions is not None:
+            try:
+                return positions.get(value)
+            except TypeError:
+                return None
+        try:
+            return values.index(value)
+        except ValueError:
+            return None
+
+    def _index_to_namespace(self, count, index):
+        _, row, dependents, value_lists, field_positions = self._get_compiled()
+        row = row.copy()
+        row[:len(index)] = [values[i] for values, i in zip(value_lists, index)]
+        if self._lazy:
+            row = [row[position] for position in field_positions]
+        else:
+            for calculate in dependents.values():
+                calculate(row)
+        return self._row_to_record(count, row)
+
+    def _row_to_record(self, count, row):
+        """Convert a row of values to the record type of this space.
+
+        Arguments:
+            count (int): The index_ of the permutation.
+            row (List[Any]): The values, in the order of the Namespace fields.
+
+        Returns:
+            Union[Namespace, Tuple[Any], Dict[str, Any]]: The permutation.
+        """
+        if self._record_type == 'namespace':
+            return self.namespace_class(count, *row)
+        elif self._record_type == 'tuple':
+            return tuple(row)
+        else:
+            return dict(zip(self.namespace_class._fields[1:], row))
+
+    def _index_to_row(self, index):
+        """Get the row of values of an index, without dependent parameters.
+
+        Arguments:
+            index (Iterable[int]): The index.
+
+        Returns:
+            List[Any]: The row.
+        """
+        _, row, _, value_lists, _ = self._get_compiled()
+        row = row.copy()
+        for place, i in enumerate(index):
+            row[place] = value_lists[place][i]
+        return row
+
+    def _calculate_row(self, row, parameter, dependent_calculations):
+        """Calculate a dependent parameter (and its dependencies) in a row.
+
+        Arguments:
+            row (List[Any]): The row.
+            parameter (str): The dependent parameter.
+            dependent_calculations (Dict[str, Callable[[List], None]]): The
+                calculations of all dependent parameters.
+
+        Returns:
+            Any: The value of the parameter.
+        """
+        for dependent in self._get_required_dependents([parameter]):
+            dependent_calculations[dependent](row)
+        return row[self._get_compiled()[0][parameter]]
+
+    def _build_namespace_class(self):
+        """Create the Namespace class for this permutation space.
+
+        Returns:
+            type: The Namespace class.
+        """
+        if self._lazy:
+            lazy = set(self.cache)
+        else:
+            lazy = set()
+        namespace_class = self._create_namespace_class(*self.topological_order, lazy=lazy, order=self.order)
+        namespace_class.pspace_ = self
+        return namespace_class
+
+    def _calculate_dependent(self, parameter, values):
+        """Calculate the value of a dependent parameter, using the cache.
+
+        Arguments:
+            parameter (Parameter): The dependent parameter.
+            values (Mapping[str, Any]): The values of (at least) the
+                parameters that the dependent parameter depends on.
+
+        Returns:
+            Any: The value of the dependent parameter.
+
+        Raises:
+            ValueError: If a value the parameter depends on is unhashable.
+        """
+        profiler = self._profiler
+        if profiler is not None:
+            profiler.count_dependent_lookup(parameter.name)
+        cache = self.cache[parameter.name]
+        key = tuple(values[key] for key in sorted(parameter.parameters))
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            self._check_hashable(parameter, key)
+            raise
+        arguments = {key: values[key] for key in parameter.parameters}
+        if profiler is None:
+            value = parameter.value(**arguments)
+        else:
+            call = profiler.wrap_dependent_call(parameter.name, lambda arguments: parameter.value(**arguments))
+            value = call(arguments)
+        cache[key] = value
+        return value
+
+    @staticmethod
+    def _check_hashable(parameter, key):
+        """Check that the key of a dependent parameter is hashable.
+
+        Arguments:
+            parameter (Parameter): The dependent parameter.
+            key (Tuple[Any]): The values of its dependencies, sorted by name.
+
+        Raises:
+            ValueError: If a value the parameter depends on is unhashable.
+        """
+        for index, key_part in enumerate(key):
+            try:
+                hash(key_part)
+            except TypeError:
+                error_parameter = sorted(parameter.parameters)[index]
+                raise ValueError(f'value {key_part} of parameter "{error_parameter}" is unhashable')
+
+    def _get_compiled(self):
+        """Get the structures for calculating values in a row.
+
+        To avoid building dictionaries for every permutation, values are
+        calculated in a list (a "row") in topological order, and functions are
+        compiled to take their arguments from the row by position.
+
+        Returns:
+            Tuple[Dict[str, int], List[Any], Dict[str, Callable[[List], None]], List[Sequence], List[int]]:
+                The position of each parameter in the row, an initial row with
+                the constants filled in, the function that calculates each
+                dependent parameter into the row (in topological order), the
+                values of each ordered parameter, and the positions of the
+                fields of a lazy Namespace.
+        """
+        if self._compiled is None:
+            positions = {parameter: position for position, parameter in enumerate(self.topological_order)}
+            row = len(self.topological_order) * [None]
+            dependents = {}
+            for position, parameter in enumerate(self.topological_order):
+                if parameter in self.order:
+                    continue
+                if self._parameters[parameter].parameters:
+                    dependents[parameter] = self._compile_dependent(parameter, positions)
+                else:
+                    row[position] = self[parameter]
+            self._compiled = (
+                positions,
+                row,
+                dependents,
+                [self._parameters[parameter].value for parameter in self.order],
+                [
+                    position for position, parameter in enumerate(self.topological_order)
+                    if parameter not in dependents
+                ],
+            )
+        return self._compiled
+
+    def _compile_dependent(self, name, positions):
+        """Compile the calculation of a dependent parameter.
+
+        Arguments:
+            name (str): The dependent parameter.
+            positions (Dict[str, int]): The position of each parameter in the
+                row.
+
+        Returns:
+            Callable[[List[Any]], None]: A function that calculates the value
+                of the parameter, using the cache, and puts it in the row.
+        """
+        parameter = self._parameters[name]
+        if iscoroutinefunction(parameter.value):
+
+            def calculate_async(row):
+                raise ValueError(f'parameter "{name}" is asynchronous; use aiter() or amap()')
+
+            return calculate_async
+        position = positions[name]
+        get_key = self._compile_getter([positions[key] for key in sorted(parameter.parameters)])
+        call = self._compile_call(parameter.value, positions)
+        if self._profiler is not None:
+            call = self._profiler.wrap_dependent_call(name, call)
+        caches = self.cache
+
+        def calculate(row):
+            cache = caches[name]
+            key = get_key(row)
+            try:
+                row[position] = cache[key]
+                return
+            except KeyError:
+                pass
+            except TypeError:
+                self._check_hashable(parameter, key)
+                raise
+            value = call(row)
+            cache[key] = value
+            row[position] = value
+
+        if self._profiler is not None:
+            return self._profiler.wrap_dependent_lookup(name, calculate)
+        return calculate
+
+    def _compile_async_dependent(self, name, positions):
+        """Compile the calculation of an asynchronous dependent parameter.
+
+        Values are cached as with other dependent parameters. While a value is
+        being calculated, other tasks that need it wait for the same
+        calculation instead of starting their own.
+
+        Arguments:
+            name (str): The dependent parameter.
+            positions (Dict[str, int]): The position of each parameter in the
+                row.
+
+        Returns:
+            Callable[[List[Any]], Awaitable[None]]: A coroutine function that
+                calculates the value of the parameter and puts it in the row.
+        """
+        parameter = self._parameters[name]
+        position = positions[name]
+        get_key = self._compile_getter([positions[key] for key in sorted(parameter.parameters)])
+        call = self._compile_call(parameter.value, positions)
+        caches = self.cache
+        in_flight = self._in_flight
+
+        def store(flight_key, future):
+            del in_flight[flight_key]
+            if not future.cancelled() and future.exception() is None:
+                caches[name][flight_key[1]] = future.result()
+
+        async def calculate(row):
+            cache = caches[name]
+            key = get_key(row)
+            try:
+                row[position] = cache[key]
+                return
+            except KeyError:
+                pass
+            except TypeError:
+                self._check_hashable(parameter, key)
+                raise
+            flight_key = (name, key)
+            future = in_flight.get(flight_key)
+            if future is None:
+                future = asyncio.ensure_future(call(row))
+                in_flight[flight_key] = future
+                future.add_done_callback(partial(store, flight_key))
+            # shield the calculation, so that cancelling one waiting task does
+            # not cancel it for the others
+            row[position] = await asyncio.shield(future)
+
+        return calculate
+
+    def _get_async_dependents(self):
+        """Get the dependent parameters whose functions are coroutines.
+
+        Returns:
+            Set[str]: The asynchronous dependent parameters.
+        """
+        return set(
+            name for name, parameter in self._parameters.items()
+            if parameter.parameters and iscoroutinefunction(parameter.value)
+        )
+
+    def _compile_filter(self, filter_func, positions):
+        """Compile a filter to take its arguments from a row.
+
+        Filters created by filter_if and filter_orthog are compiled from their
+        arguments, so that no dictionaries are built.
+
+        Arguments:
+            filter_func (FilterFunction): The filter.
+            positions (Dict[str, int]): The position of each parameter in the
+                row.
+
+        Returns:
+            Callable[[List[Any]], bool]: The compiled filter.
+        """
+        if filter_func.kind == 'if':
+            antecedent_func = self._compile_call(filter_func.arguments[0], positions)
+            consequent_func = self._compile_call(filter_func.arguments[1], positions)
+            return (lambda row: not antecedent_func(row) or consequent_func(row))
+        elif filter_func.kind == 'orthog':
+            k, defaults = filter_func.arguments
+            return self._compile_orthog(k, defaults, positions)
+        else:
+            return self._compile_call(filter_func.function, positions)
+
+    @staticmethod
+    def _compile_orthog(k, defaults, positions):
+        """Compile a filter from filter_orthog.
+
+        Arguments:
+            k (int): The number of deviations.
+            defaults (Dict[str, Any]): The default values for each parameter.
+            positions (Dict[str, int]): The position of each parameter in the
+                row.
+
+        Returns:
+            Callable[[List[Any]], bool]: The compiled filter.
+        """
+        pairs = tuple((positions[parameter], value) for parameter, value in defaults.items())
+
+        def orthogonal_func(row):
+            diff_count = 0
+            for position, value in pairs:
+                if row[position] != value:
+                    diff_count += 1
+                    if diff_count > k:
+                        return False
+            return True
+
+        return orthogonal_func
+
+    @staticmethod
+    def _compile_call(function, positions):
+        """Compile a function to take its arguments from a row.
+
+        Arguments:
+            function (Callable[..., Any]): The function, whose parameters are
+                parameters of the permutation space.
+            positions (Dict[str, int]): The position of each parameter in the
+                row.
+
+        Returns:
+            Callable[[List[Any]], Any]: A function that calls the original
+                function with arguments from the row.
+        """
+        parameters = signature(function).parameters
+        positional_kinds = (SignatureParameter.POSITIONAL_ONLY, SignatureParameter.POSITIONAL_OR_KEYWORD)
+        if any(parameter.kind not in positional_kinds for parameter in parameters.values()):
+            items = [(parameter, positions[parameter]) for parameter in parameters]
+            return (lambda row: function(**{parameter: row[position] for parameter, position in items}))
+        arg_positions = [positions[parameter] for parameter in parameters]
+        if not arg_positions:
+            return (lambda row: function())
+        elif len(arg_positions) == 1:
+            position = arg_positions[0]
+            return (lambda row: function(row[position]))
+        else:
+            get_args = itemgetter(*arg_positions)
+            return (lambda row: function(*get_args(row)))
+
+    @staticmethod
+    def _compile_getter(key_positions):
+        """Compile a function that gets a tuple of values from a row.
+
+        Arguments:
+            key_positions (List[int]): The positions of the values.
+
+        Returns:
+            Callable[[List[Any]], Tuple[Any]]: The function.
+        """
+        if not key_positions:
+            return (lambda row: ())
+        elif len(key_positions) == 1:
+            position = key_positions[0]
+            return (lambda row: (row[position],))
+        else:
+            return itemgetter(*key_positions)
+
+    def _get_required_dependents(self, parameters):
+        """Get the dependent parameters needed to calculate some parameters.
+
+        Arguments:
+            parameters (Iterable[str]): A collection of parameters.
+
+        Returns:
+            List[str]: The dependent parameters that must be calculated, in
+                topological order.
+        """
+        required = set()
+        queue = list(parameters)
+        while queue:
+            parameter = self._parameters[queue.pop()]
+            if parameter.parameters and parameter.name not in required:
+                required.add(parameter.name)
+                queue.extend(parameter.parameters)
+        return [
+            parameter for parameter in self.topological_order
+            if parameter in required
+        ]
+
+    def _get_place_filters(self):
+        """Group the filters by the place at which they can be decided.
+
+        Filters from filter_orthog are also partially checked at earlier
+        places, since a prefix that already has more than k non-default values
+        cannot pass the whole filter.
+
+        Returns:
+            Tuple[List[List[Tuple[Callable[[List], bool], List[Callable[[List], None]]]]], List[Set[str]]]:
+                For each place in the order, the compiled filters that can be
+                decided at that place, together with the calculations of the
+                dependent parameters they need; and for each place, the
+                parameters of those filters.
+        """
+        positions, _, dependents, value_lists, _ = self._get_compiled()
+        place_filters = [[] for _ in self.order]
+        place_parameters = [set() for _ in self.order]
+        for filter_index, filter_func in enumerate(self.filters):
+            compiled_filter = self._compile_filter(filter_func, positions)
+            if self._profiler is not None:
+                compiled_filter = self._profile_filter(
+                    filter_index, filter_func, compiled_filter, filter_func.min_place,
+                )
+            place_filters[filter_func.min_place].append((
+                compiled_filter,
+                [
+                    dependents[parameter]
+                    for parameter in self._get_required_dependents(filter_func.parameters)
+                ],
+            ))
+            place_parameters[filter_func.min_place] |= filter_func.parameters
+            if filter_func.kind != 'orthog':
+                continue
+            k, defaults = filter_func.arguments
+            ordered_defaults = {
+                parameter: value for parameter, value in defaults.items()
+                if parameter in self.order
+            }
+            for place in sorted(set(self.order.index(parameter) for parameter in ordered_defaults)):
+                if place >= filter_func.min_place:
+                    continue
+                partial_defaults = {
+                    parameter: value for parameter, value in ordered_defaults.items()
+                    if self.order.index(parameter) <= place
+                }
+                partial_filter = self._compile_orthog(k, partial_defaults, positions)
+                if self._profiler is not None:
+                    partial_filter = self._profile_filter(filter_index, filter_func, partial_filter, place)
+                place_filters[place].append((partial_filter, []))
+                place_parameters[place] |= set(partial_defaults)
+        return place_filters, place_parameters
+
+    def _profile_filter(self, filter_index, filter_func, compiled_filter, place):
+        """Wrap a compiled filter to profile it.
+
+        Arguments:
+            filter_index (int): The position of the filter in self.filters.
+            filter_func (FilterFunction): The filter.
+            compiled_filter (Callable[[List], bool]): The compiled filter.
+            place (int): The place at which the filter is checked.
+
+        Returns:
+            Callable[[List], bool]: The wrapped filter.
+        """
+        method = 'filter' if filter_func.kind == 'filter' else f'filter_{filter_func.kind}'
+        name = f'{filter_index}: {method}({", ".join(sorted(filter_func.parameters))})'
+        leaves = reduce(mul, (len(values) for values in self._get_compiled()[3][place + 1:]), 1)
+        return self._profiler.wrap_filter(name, compiled_filter, leaves)
+
+    @staticmethod
+    def _check_filters(filters, row):
+        """Check if a (partial) row of values passes some filters.
+
+        Arguments:
+            filters (List[Tuple[Callable[[List], bool], List[Callable[[List], None]]]]):
+                The compiled filters, together with the calculations of the
+                dependent parameters they need.
+            row (List[Any]): The values of the parameters. Required dependent
+                parameters will be calculated as a side effect.
+
+        Returns:
+            bool: True if the values pass all the filters.
+        """
+        for filter_func, dependents in filters:
+            for calculate in dependents:
+                calculate(row)
+            if not filter_func(row):
+                return False
+        return True
+
+    def _count_permutations(self):
+        """Count the number of permutations without building them.
+
+        Without filters, this is simply the product of the number of values of
+        each parameter. With filters, the permutations are counted depth-first
+        (see _count_below).
+
+        Returns:
+            int: The number of permutations in the space.
+        """
+        if not self.filters:
+            return reduce(mul, (len(self[parameter]) for parameter in self.order), 1)
+        if not self.order:
+            return 1
+        return self._count_below(0, len(self.order) * [0], self._get_compiled()[1].copy())
+
+    def _get_search(self):
+        """Get the structures for searching through the filtered space.
+
+        Returns:
+            SearchStructures: The filters that can be decided at each place
+                (see _get_place_filters); the earlier places that affect the
+                filters at or after each place, and the memoized counts of
+                permutations keyed by those places (see _count_below); and the
+                earlier places that affect the filters at each place, and the
+                memoized allowed values keyed by those places (see
+                _get_allowed); and the memoized cumulative counts, keyed like
+                the counts (see _get_cumulative_counts).
+        """
+        if self._search is None:
+            place_filters, place_parameters = self._get_place_filters()
+            count_key_places = []
+            allowed_key_places = []
+            for place in range(len(self.order)):
+                dependencies = self._get_dependencies(set().union(*place_parameters[place:]))
+                count_key_places.append([
+                    prev_place for prev_place, parameter in enumerate(self.order[:place])
+                    if parameter in dependencies
+                ])
+                dependencies = self._get_dependencies(place_parameters[place])
+                key_places = [
+                    prev_place for prev_place, parameter in enumerate(self.order[:place])
+                    if parameter in dependencies
+                ]
+                if len(key_places) == place:
+                    # every prefix is different, so memoizing would not help
+                    allowed_key_places.append(None)
+                else:
+                    allowed_key_places.append(key_places)
+            self._search = PermutationSpace.SearchStructures(
+                place_filters,
+                count_key_places,
+                [{} for _ in self.order],
+                allowed_key_places,
+                [{} for _ in self.order],
+                [{} for _ in self.order],
+            )
+        return self._search
+
+    def _get_allowed(self, place, index, row):
+        """Get the values of a place that pass the filters decidable there.
+
+        Since the result only depends on the earlier values that the filters
+        depend on, it is memoized by (the indices of) those values, unless
+        they include every earlier place.
+
+        Arguments:
+            place (int): The place.
+            index (List[int]): The index, of which only the prefix before the
+                place is used.
+            row (List[Any]): The values of the prefix. Values at and after the
+                place will be modified.
+
+        Returns:
+            Sequence[int]: The allowed indices of the values at the place, in
+                increasing order.
+        """
+        search = self._get_search()
+        values = self._get_compiled()[3][place]
+        filters = search.place_filters[place]
+        if not filters:
+            return range(len(values))
+        key_places = search.allowed_key_places[place]
+        if key_places is not None:
+            key = tuple(index[prev_place] for prev_place in key_places)
+            memo = search.allowed_memos[place]
+            if key in memo:
+                return memo[key]
+        if self._profiler is not None:
+            self._profiler.candidates += len(values)
+        allowed = []
+        for i, value in enumerate(values):
+            row[place] = value
+            if self._check_filters(filters, row):
+                allowed.append(i)
+        if key_places is not None:
+            memo[key] = allowed
+        return allowed
+
+    def _count_below(self, place, index, row):
+        """Count the permutations that start with a particular prefix.
+
+        Each filter is checked as soon as its least significant dependency is
+        assigned. Since the number of permutations below a place only depends
+        on the earlier values that later filters depend on, the counts are
+        memoized by (the indices of) those values.
+
+        Arguments:
+            place (int): The number of places in the prefix.
+            index (List[int]): The index, of which only the prefix is used.
+                Places after the prefix will be modified.
+            row (List[Any]): The values of the prefix, which must already pass
+                the filters. Values after the prefix will be modified.
+
+        Returns:
+            int: The number of permutations that start with the prefix.
+        """
+        if place == len(self.order):
+            return 1
+        search = self._get_search()
+        key = tuple(index[prev_place] for prev_place in search.count_key_places[place])
+        memo = search.count_memos[place]
+        if key not in memo:
+            total = 0
+            values = self._get_compiled()[3][place]
+            for i in self._get_allowed(place, index, row):
+                index[place] = i
+                row[place] = values[i]
+                total += self._count_below(place + 1, index, row)
+            memo[key] = total
+        return memo[key]
+
+    def _rank_to_index(self, rank):
+        """Convert the position of a permutation to its index.
+
+        Arguments:
+            rank (int): The position of the permutation, which must be valid.
+
+        Returns:
+            List[int]: The index of the permutation.
+        """
+        if not self.filters:
+            return self._product_rank_to_index(rank)
+        value_lists = self._get_compiled()[3]
+        index = len(self.order) * [0]
+        row = self._get_compiled()[1].copy()
+        for place in range(len(self.order)):
+            allowed, cumulative = self._get_cumulative_counts(place, index, row)
+            position = bisect_right(cumulative, rank) - 1
+            rank -= cumulative[position]
+            index[place] = allowed[position]
+            row[place] = value_lists[place][index[place]]
+        return index
+
+    def _get_cumulative_counts(self, place, index, row):
+        """Get the number of permutations before each allowed value of a place.
+
+        The counts are memoized by the same earlier values as _count_below(),
+        unless they include every earlier place.
+
+        Arguments:
+            place (int): The place.
+            index (List[int]): The index, of which only the prefix before the
+                place is used. Places at and after the place will be modified.
+            row (List[Any]): The values of the prefix. Values at and after the
+                place will be modified.
+
+        Returns:
+            Tuple[Sequence[int], List[int]]: The allowed indices of the values
+                at the place, and the number of permutations with the prefix
+                that come before each of them, followed by the total.
+        """
+        search = self._get_search()
+        key_places = search.count_key_places[place]
+        key = tuple(index[prev_place] for prev_place in key_places)
+        memo = search.cumulative_memos[place]
+        if key in memo:
+            return memo[key]
+        values = self._get_compiled()[3][place]
+        allowed = self._get_allowed(place, index, row)
+        cumulative = [0]
+        for i in allowed:
+            index[place] = i
+            row[place] = values[i]
+            cumulative.append(cumulative[-1] + self._count_below(place + 1, index, row))
+        if place == 0 or len(key_places) < place:
+            memo[key] = (allowed, cumulative)
+        return allowed, cumulative
+
+    def _product_rank_to_index(self, rank):
+        """Convert a position in the unfiltered space to an index.
+
+        Arguments:
+            rank (int): The position, ignoring filters.
+
+        Returns:
+            List[int]: The index at that position.
+        """
+        index = []
+        for parameter in reversed(self.order):
+            rank, i = divmod(rank, len(self[parameter]))
+            index.append(i)
+        return index[::-1]
+
+    def _index_to_rank(self, index):
+        """Convert the index of a permutation to its position.
+
+        Arguments:
+            index (List[int]): The index of the permutation.
+
+        Returns:
+            int: The position of the permutation.
+
+        Raises:
+            ValueError: If the permutation is filtered out.
+        """
+        rank, valid = self._count_before(index)
+        if not valid:
+            raise ValueError('permutation is not in the space')
+        return rank
+
+    def _count_before(self, index):
+        """Count the permutations before an index.
+
+        Arguments:
+            index (List[int]): The index, which may be filtered out.
+
+        Returns:
+            Tuple[int, bool]: The number of permutations before the index, and
+                whether the index itself passes the filters.
+        """
+        if not self.filters:
+            rank = 0
+            for parameter, i in zip(self.order, index):
+                rank = rank * len(self[parameter]) + i
+            return rank, True
+        value_lists = self._get_compiled()[3]
+        rank = 0
+        prefix = len(self.order) * [0]
+        row = self._get_compiled()[1].copy()
+        for place in range(len(self.order)):
+            allowed, cumulative = self._get_cumulative_counts(place, prefix, row)
+            position = bisect_left(allowed, index[place])
+            rank += cumulative[position]
+            if position == len(allowed) or allowed[position] != index[place]:
+                return rank, False
+            prefix[place] = index[place]
+            row[place] = value_lists[place][index[place]]
+        return rank, True
+
+    @staticmethod
+    def _create_namespace_class(*parameters, lazy=(), order=()):
+        fields = [parameter for parameter in parameters if parameter not in lazy]
+        uniqstr_format = ','.join(f'{parameter}={{}}' for parameter in order)
+        num_order = len(order)
+
+        class Namespace(namedtuple('Namespace', ['index_', *fields])):
+
+            __slots__ = ()
+
+            # set to the permutation space when the class is created
+            pspace_ = None
+
+            def __iter__(self):
+                return iter(parameters)
+
+            def __str__(self):
+                return super().__repr__()
+
+            @property
+            def uniqstr_(self):
+                # the ordered parameters are always the first fields
+                return uniqstr_format.format(*tuple.__getitem__(self, slice(1, num_order + 1)))
+
+            def keys(self):
+                yield from parameters
+
+            def values(self):
+                if lazy:
+                    for field in self:
+                        yield getattr(self, field)
+                else:
+                    yield from tuple.__getitem__(self, slice(1, None))
+
+            def items(self):
+                return zip(self.keys(), self.values())
+
+        def create_lazy_property(name):
+
+            def getter(self):
+                parameter = self.pspace_._parameters[name]
+                return self.pspace_._calculate_dependent(parameter, {
+                    key: getattr(self, key) for key in parameter.parameters
+                })
+
+            return property(getter)
+
+        for parameter in lazy:
+            setattr(Namespace, parameter, create_lazy_property(parameter))
+
+        return Namespace
+
+    @staticmethod
+    def _create_filter_func(kind, arguments):
+        """Create the function of a filter from its arguments.
+
+        Arguments:
+            kind (str): The kind of filter (see _add_filter).
+            arguments (Tuple[Any]): The arguments used to create the filter.
+
+        Returns:
+            Callable[[*Any], bool]: The function of the filter.
+        """
+        if kind == 'if':
+            return PermutationSpace._create_filter_if_func(*arguments)
+        if kind == 'orthog':
+            k, defaults = arguments
+            return PermutationSpace._create_filter_orthog_func(k, **defaults)
+        return arguments[0]
+
+    @staticmethod
+    def _create_filter_if_func(antecedent_func, consequent_func, antecedent_params, consequent_params):
+        def if_func(**kwargs):
+            antecedent_args = {
+                k: v for k, v in kwargs.items()
+                if k in antecedent_params
+            }
+            consequent_args = {
+                k: v for k, v in kwargs.items()
+                if k in consequent_params
+            }
+            return (
+                not antecedent_func(**antecedent_args)
+                or consequent_func(**consequent_args)
+            )
+        return if_func
+
+    @staticmethod
+    def _create_filter_orthog_func(k, **defaults):
+        def orthogonal_func(**kwargs):
+            diff_count = 0
+            for parameter, value in defaults.items():
+                if kwargs[parameter] != value:
+                    diff_count += 1
+                    if diff_count > k:
+                        return False
+            return True
+        return orthogonal_func
+
+
+class PermutationIterator:
+    """An iterator through a permutation space that can be checkpointed."""
+
+    def __init__(self, pspace, start_index, end_index=None, count=0, skip=0):
+        """Initialize the PermutationIterator.
+
+        Arguments:
+            pspace (PermutationSpace): The permutation space.
+            start_index (Optional[List[int]]): The inclusive starting index,
+                or None if the iterator is already exhausted.
+            end_index (List[int]): The exclusive ending index. Defaults to
+                None, which continues to the end of the space.
+            count (int): The index_ of the first permutation. Defaults to 0.
+            skip (int): Permutations whose index_ is less than this are
+                skipped. Defaults to 0.
+        """
+        self.pspace = pspace
+        self.end_index = end_index
+        self.count = count
+        self.skip = skip
+        if start_index is None:
+            self.start_index = None
+            self._indices = iter(())
+        else:
+            self.start_index = list(start_index)
+            self._indices = pspace._iter_indices(self.start_index, end_index)
+        # the index list being modified by _iter_indices, once it has started
+        self._index = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            try:
+                self._index = next(self._indices)
+            except StopIteration:
+                self._index = None
+                self._indices = iter(())
+                self.start_index = None
+                raise
+            count = self.count
+            self.count += 1
+            if self.skip <= count:
+                return self.pspace._index_to_namespace(count, self._index)
+
+    def checkpoint(self):
+        """Get a checkpoint of the progress of the iterator.
+
+        The checkpoint only contains lists, integers, strings, and None, and
+        can therefore be serialized to JSON.
+
+        Returns:
+            Dict[str, Any]: A token for PermutationSpace.resume().
+        """
+        if self._index is not None:
+            # _iter_indices has not modified the index since it was yielded
+            start_index = self._successor(self._index)
+        elif self.start_index is None:
+            start_index = None
+        else:
+            start_index = list(self.start_index)
+        return {
+            'start': start_index,
+            'end': self.end_index,
+            'count': self.count,
+            'skip': self.skip,
+            'fingerprint': self.pspace.fingerprint,
+        }
+
+    def _successor(self, index):
+        """Get the next index in the unfiltered space.
+
+        Arguments:
+            index (List[int]): The index.
+
+        Returns:
+            Optional[List[int]]: The next index, or None if this is the last.
+        """
+        successor = list(index)
+        for place in range(len(successor) - 1, -1, -1):
+            successor[place] += 1
+            if successor[place] < len(self.pspace[self.pspace.order[place]]):
+                return successor
+            successor[place] = 0
+        return None
+
+
+_WORKER_PSPACES = {}
+
+
+def _map_chunk(pspace, func, chunk):
+    """Apply a function to a chunk of permutations.
+
+    Arguments:
+        pspace (PermutationSpace): The permutation space.
+        func (Callable[[Namespace], Any]): The function to apply.
+        chunk (List[Tuple[int, Tuple[int]]]): The index_ and the index of each
+            permutation.
+
+    Returns:
+        List[Tuple[int, Any]]: The index_ of each permutation and the result of
+            the function.
+    """
+    return [
+        (rank, func(pspace._index_to_namespace(rank, index)))
+        for rank, index in chunk
+    ]
+
+
+def _map_pickled_chunk(key, payload, func, chunk):
+    """Apply a function to a chunk of permutations in a worker process.
+
+    The permutation space is only unpickled the first time a process sees it,
+    so that its cache of dependent parameters is kept between chunks.
+
+    Arguments:
+        key (str): A unique identifier for the permutation space.
+        payload (bytes): The pickled permutation space.
+        func (Callable[[Namespace], Any]): The function to apply.
+        chunk (List[Tuple[int, Tuple[int]]]): The index_ and the index of each
+            permutation.
+
+    Returns:
+        List[Tuple[int, Any]]: The index_ of each permutation and the result of
+            the function.
+    """
+    if key not in _WORKER_PSPACES:
+        _WORKER_PSPACES.clear()
+        _WORKER_PSPACES[key] = pickle.loads(payload)
+    return _map_chunk(_WORKER_PSPACES[key], func, chunk)
+
+
+def _restore_pspace(state):
+    """Restore a permutation space pickled by PermutationSpace.__reduce__().
+
+    Arguments:
+        state (Tuple[Any]): The pickled state.
+
+    Returns:
+        PermutationSpace: The permutation space.
+    """
+    pspace = PermutationSpace.__new__(PermutationSpace)
+    (
+        pspace.order,
+        pspace._parameters,
+        filters,
+        pspace.topological_order,
+        pspace._cache_policies,
+        pspace._lazy,
+        pspace._record_type,
+        profiling,
+        pspace._size,
+        pspace._fingerprint,
+    ) = state
+    pspace.filters = [
+        PermutationSpace.FilterFunction(
+            PermutationSpace._create_filter_func(kind, arguments),
+            parameters,
+            min_place,
+            kind,
+            arguments,
+        )
+        for parameters, min_place, kind, arguments in filters
+    ]
+    pspace._value_positions = {
+        parameter: pspace._create_value_positions(pspace._parameters[parameter].value)
+        for parameter in pspace.order
+    }
+    pspace._profiler = Profiler() if profiling else None
+    pspace._in_flight = {}
+    pspace._search = None
+    pspace._compiled = None
+    pspace.cache = pspace._create_caches()
+    pspace.namespace_class = pspace._build_namespace_class()
+    return pspace
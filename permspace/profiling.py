@@ -0,0 +1,175 @@
+"""Profiling of filters and dependent parameters."""
+
+from time import perf_counter
+
+
+class Profiler:
+    """Statistics of the filters and dependent parameters of a space.
+
+    The profiler wraps the compiled filters and dependent parameters to count
+    and time their calls, so that no work is done when profiling is disabled.
+    """
+
+    def __init__(self):
+        """Initialize the Profiler."""
+        self.filters = {}
+        self.dependents = {}
+        self.candidates = 0
+        self.yielded = 0
+
+    def wrap_filter(self, name, filter_func, leaves):
+        """Wrap a compiled filter to profile it.
+
+        Arguments:
+            name (str): The name of the filter.
+            filter_func (Callable[[List], bool]): The compiled filter.
+            leaves (int): The number of permutations, ignoring filters, that
+                share a prefix rejected by the filter.
+
+        Returns:
+            Callable[[List], bool]: The wrapped filter.
+        """
+        stats = self.filters.setdefault(name, {
+            'evaluations': 0,
+            'rejections': 0,
+            'time': 0.0,
+            'leaves_pruned': 0,
+        })
+
+        def profiled_filter(row):
+            start = perf_counter()
+            result = filter_func(row)
+            stats['time'] += perf_counter() - start
+            stats['evaluations'] += 1
+            if not result:
+                stats['rejections'] += 1
+                stats['leaves_pruned'] += leaves
+            return result
+
+        return profiled_filter
+
+    def _get_dependent_stats(self, name):
+        return self.dependents.setdefault(name, {
+            'lookups': 0,
+            'calls': 0,
+            'time': 0.0,
+        })
+
+    def wrap_dependent_call(self, name, call):
+        """Wrap the function of a dependent parameter to profile it.
+
+        Arguments:
+            name (str): The dependent parameter.
+            call (Callable[[List], Any]): The compiled call of the function.
+
+        Returns:
+            Callable[[List], Any]: The wrapped call.
+        """
+        stats = self._get_dependent_stats(name)
+
+        def profiled_call(row):
+            start = perf_counter()
+            value = call(row)
+            stats['time'] += perf_counter() - start
+            stats['calls'] += 1
+            return value
+
+        return profiled_call
+
+    def wrap_dependent_lookup(self, name, calculate):
+        """Wrap the calculation of a dependent parameter to count lookups.
+
+        Arguments:
+            name (str): The dependent parameter.
+            calculate (Callable[[List], None]): The compiled calculation,
+                which looks up the cache before calling the function.
+
+        Returns:
+            Callable[[List], None]: The wrapped calculation.
+        """
+        stats = self._get_dependent_stats(name)
+
+        def profiled_calculate(row):
+            stats['lookups'] += 1
+            calculate(row)
+
+        return profiled_calculate
+
+    def count_dependent_lookup(self, name):
+        """Count a lookup of a dependent parameter outside compiled calculations.
+
+        Arguments:
+            name (str): The dependent parameter.
+        """
+        self._get_dependent_stats(name)['lookups'] += 1
+
+    def count_yielded(self, indices):
+        """Count the permutations found by a search.
+
+        Arguments:
+            indices (Iterable[List[int]]): The indices of the permutations.
+
+        Yields:
+            List[int]: The same indices.
+        """
+        for index in indices:
+            self.yielded += 1
+            yield index
+
+    def as_dict(self):
+        """Get the statistics as a dictionary.
+
+        Returns:
+            Dict[str, Any]: The number of candidate values tested against
+                filters and of permutations yielded; for each filter, the
+                number of evaluations and rejections, the time in seconds, and
+                the number of leaves pruned; and for each dependent parameter,
+                the number of calls and cache hits, and the time in seconds.
+        """
+        return {
+            'candidates': self.candidates,
+            'yielded': self.yielded,
+            'filters': {name: dict(stats) for name, stats in self.filters.items()},
+            'dependents': {
+                name: {
+                    'calls': stats['calls'],
+                    'hits': stats['lookups'] - stats['calls'],
+                    'time': stats['time'],
+                }
+                for name, stats in self.dependents.items()
+            },
+        }
+
+    def report(self):
+        """Format the statistics as a table.
+
+        Returns:
+            str: The report.
+        """
+        stats = self.as_dict()
+        lines = [
+            f'candidates examined: {stats["candidates"]}',
+            f'permutations yielded: {stats["yielded"]}',
+        ]
+        if stats['filters']:
+            width = max(len('filter'), *(len(name) for name in stats['filters']))
+            lines.append('')
+            lines.append(
+                f'{"filter":<{width}}  {"evaluations":>11}  {"rejections":>10}  '
+                f'{"time (s)":>10}  {"leaves pruned":>13}'
+            )
+            for name, filter_stats in stats['filters'].items():
+                lines.append(
+                    f'{name:<{width}}  {filter_stats["evaluations"]:>11}  {filter_stats["rejections"]:>10}  '
+                    f'{filter_stats["time"]:>10.4f}  {filter_stats["leaves_pruned"]:>13}'
+                )
+        if stats['dependents']:
+            width = max(len('dependent'), *(len(name) for name in stats['dependents']))
+            lines.append('')
+            lines.append(f'{"dependent":<{width}}  {"calls":>11}  {"hits":>10}  {"time (s)":>10}')
+            for name, dependent_stats in stats['dependents'].items():
+                lines.append(
+                    f'{name:<{width}}  {dependent_stats["calls"]:>11}  {dependent_stats["hits"]:>10}  '
+                    f'{dependent_stats["time"]:>10.4f}'
+                )
+        return '\n'.join(lines)
@@ -9,4 +9,7 @@ setup(
     author_email='justinnhli@gmail.com',
     license='MIT',
     packages=['permspace'],
+    extras_require={
+        'numpy': ['numpy'],
+    },
 )
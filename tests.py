@@ -1,3 +1,10 @@
+import asyncio
+import json
+import os
+import pickle
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from copy import deepcopy
 from unittest import TestCase, main
 from itertools import product
@@ -120,3 +127,667 @@ def test_record_store():
             not (num_albums == 5000 and max_internal_actions == 1)
     )
     assert len(pspace) == 70
+
+
+def test_len():
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(5),
+        y=range(4),
+        z=range(3),
+        total=(lambda x, y, z: x + y + z),
+    )
+    assert len(pspace) == 60
+    pspace.filter(lambda total: total % 2 == 0)
+    assert len(pspace) == len(list(pspace)) == 30
+    pspace.filter(lambda y: y != 1)
+    assert len(pspace) == len(list(pspace))
+    pspace.filter_orthog(x=0, z=0)
+    assert len(pspace) == len(list(pspace))
+
+
+def test_early_filtering():
+    calls = []
+
+    def filter_func(x):
+        calls.append(x)
+        return x < 2
+
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(5),
+        y=range(10),
+        z=range(10),
+    ).filter(filter_func)
+    assert len(list(iter(pspace))) == 200
+    assert sorted(calls) == list(range(5))
+    assert [p.index_ for p in pspace.iter_from({'x': 1}, skip=98)] == [98, 99]
+
+
+def test_random_access():
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(4),
+        y=list('abc'),
+        z=range(3),
+        name=(lambda x, y: f'{x}{y}'),
+    )
+    permutations = list(iter(pspace))
+    assert [pspace.at(i) for i in range(len(pspace))] == permutations
+    assert pspace[-1] == permutations[-1]
+    assert [pspace.index_of(p) for p in permutations] == list(range(len(pspace)))
+    with pytest.raises(IndexError):
+        pspace.at(len(pspace))
+    pspace.filter(lambda name: name != '1b').filter(lambda x, z: x != z)
+    permutations = list(iter(pspace))
+    assert [pspace.at(i) for i in range(len(pspace))] == permutations
+    assert [pspace.index_of(p) for p in permutations] == list(range(len(pspace)))
+    assert pspace.index_of({'x': 3, 'y': 'c', 'z': 2}) == len(pspace) - 1
+    with pytest.raises(ValueError):
+        pspace.index_of({'x': 1, 'y': 'b', 'z': 2})
+
+
+def test_shard():
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(5),
+        y=range(3),
+        z=range(4),
+    ).filter(lambda x: x != 0).filter(lambda y, z: y <= z)
+    permutations = list(iter(pspace))
+    for strategy in ['contiguous', 'balanced', 'strided']:
+        for num_shards in [1, 4, 7, 100]:
+            shards = [
+                list(pspace.shard(num_shards, shard_id, strategy=strategy))
+                for shard_id in range(num_shards)
+            ]
+            assert sorted(p for shard in shards for p in shard) == permutations
+        if strategy == 'balanced':
+            assert {len(shard) for shard in shards} == {0, 1}
+    # empty shards can still be checkpointed
+    small = PermutationSpace(['x'], x=range(3))
+    for strategy in ['contiguous', 'balanced']:
+        shard = small.shard(5, 0, strategy=strategy)
+        assert list(shard) == []
+        assert list(small.resume(shard.checkpoint())) == []
+    with pytest.raises(ValueError):
+        pspace.shard(2, 2)
+    with pytest.raises(ValueError):
+        pspace.shard(2, 0, strategy='random')
+
+
+def _product(x, y):
+    return x * y
+
+
+def _get_product(parameters):
+    return parameters.product
+
+
+def _y_is_odd(y):
+    return y % 2 == 1
+
+
+def _x_is_zero(x):
+    return x == 0
+
+
+def test_map():
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=range(10),
+        y=range(10),
+        product=_product,
+    ).filter(_y_is_odd)
+    expected = [(p.index_, p.product) for p in pspace]
+    assert list(pspace.map(_get_product)) == expected
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(pspace.map(_get_product, executor=executor, chunksize=3, max_pending=2)) == expected
+        assert sorted(pspace.imap_unordered(_get_product, executor=executor)) == expected
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert list(pspace.map(_get_product, executor=executor, chunksize=7)) == expected
+        pspace.filter_orthog(k=1, x=0, y=1).filter_if(_x_is_zero, _y_is_odd)
+        expected = [(p.index_, p.product) for p in pspace]
+        assert list(pspace.map(_get_product, executor=executor, chunksize=3)) == expected
+        assert sorted(pspace.imap_unordered(_get_product, executor=executor)) == expected
+
+
+def test_cache_policy():
+    calls = []
+
+    def name(x, z):
+        calls.append((x, z))
+        return f'{x}.{z}'
+
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(3),
+        y=range(3),
+        z=range(3),
+        name=name,
+    )
+    names = [p.name for p in pspace]
+    assert len(calls) == 9
+    assert pspace.cache_stats()['name'] == {'hits': 18, 'misses': 9, 'evictions': 0, 'size': 9}
+    for policy, maxsize, num_calls in [('none', None, 27), ('lru', 3, 9), ('lru', 2, 27), ('prefix', None, 9)]:
+        calls.clear()
+        pspace.set_cache_policy(policy, maxsize=maxsize)
+        assert [p.name for p in pspace] == names
+        assert len(calls) == num_calls
+    assert pspace.cache_stats()['name']['size'] == 3
+    with pytest.raises(ValueError):
+        pspace.set_cache_policy('lru')
+    with pytest.raises(ValueError):
+        pspace.set_cache_policy('none', parameters=['x'])
+
+
+def test_lazy():
+    calls = []
+
+    def name(x, y):
+        calls.append((x, y))
+        return f'{x}.{y}'
+
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=range(3),
+        y=range(3),
+        name=name,
+        title=(lambda name: name.upper()),
+    ).filter(lambda x: x > 0).set_lazy()
+    permutations = list(iter(pspace))
+    assert calls == []
+    assert permutations[0].title == '1.0'
+    assert calls == [(1, 0)]
+    assert dict(permutations[-1].items()) == {'x': 2, 'y': 2, 'name': '2.2', 'title': '2.2'}
+    pspace.filter(lambda name: name != '1.1')
+    assert len(list(iter(pspace))) == 5
+    assert len(calls) == 6
+
+
+def test_sqlite_cache(tmp_path):
+    calls = []
+
+    def name(x, y):
+        calls.append((x, y))
+        return f'{x}.{y}'
+
+    def create_pspace():
+        return PermutationSpace(
+            ['x', 'y'],
+            x=range(3),
+            y=range(3),
+            name=name,
+        ).set_cache_policy('sqlite', path=str(tmp_path / 'cache.db'))
+
+    names = [p.name for p in create_pspace()]
+    assert len(calls) == 9
+    pspace = create_pspace().preload_caches()
+    assert [p.name for p in pspace] == names
+    assert len(calls) == 9
+    assert pspace.cache_stats()['name']['size'] == 9
+    # each thread uses its own connection
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(create_pspace().map((lambda p: p.name), executor=executor))
+    assert [result for _, result in results] == names
+    assert len(calls) == 9
+    # keys are equal if their values are equal
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=[0.0, 1.0, 2.0],
+        y=[False, True, 2],
+        name=name,
+    ).set_cache_policy('sqlite', path=str(tmp_path / 'cache.db'))
+    assert [p.name for p in pspace] == names
+    assert len(calls) == 9
+    with pytest.raises(ValueError):
+        pspace.set_cache_policy('sqlite')
+
+
+class _Below:
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def __call__(self, x):
+        return x < self.limit
+
+
+def _create_checkpoint_pspace(values):
+    return PermutationSpace(
+        ['x', 'y'],
+        x=values,
+        y=list('abc'),
+    ).filter_if((lambda x: x in {1, 2}), (lambda y: y in {'a', 'b'})).filter(_Below(3))
+
+
+def test_checkpoint():
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(3),
+        y=range(3),
+        z=range(3),
+    ).filter(lambda y, z: y != z)
+    permutations = list(iter(pspace))
+    iterator = iter(pspace)
+    for _ in range(5):
+        next(iterator)
+    token = json.loads(json.dumps(iterator.checkpoint()))
+    assert list(pspace.resume(token)) == permutations[5:]
+    assert list(iterator) == permutations[5:]
+    finished = pspace.resume(iterator.checkpoint())
+    assert list(finished) == []
+    assert finished.checkpoint()['start'] is None
+    product_pspace = PermutationSpace(['x', 'y'], x=range(2), y=range(2))
+    iterator = iter(product_pspace)
+    for _ in range(4):
+        next(iterator)
+    token = iterator.checkpoint()
+    assert token['start'] is None
+    finished = product_pspace.resume(token)
+    assert list(finished) == []
+    assert finished.checkpoint() == token
+    iterator = pspace.iter_from({'x': 1}, skip=2)
+    assert list(pspace.resume(iterator.checkpoint())) == list(iterator)
+    shard = pspace.shard(2, 1)
+    next(shard)
+    assert list(pspace.resume(shard.checkpoint())) == list(shard)
+    pspace.filter(lambda x: x != 1)
+    with pytest.raises(ValueError):
+        pspace.resume(token)
+    # the fingerprint is the same in other processes, but not for other values
+    pspace = _create_checkpoint_pspace(range(4))
+    iterator = iter(pspace)
+    next(iterator)
+    token = iterator.checkpoint()
+    for seed in ['1', '2']:
+        output = subprocess.run(
+            [sys.executable, '-c', 'import tests; print(tests._create_checkpoint_pspace(range(4)).fingerprint)'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env={**os.environ, 'PYTHONHASHSEED': seed},
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        assert output.strip() == token['fingerprint']
+    assert list(_create_checkpoint_pspace(range(4)).resume(token)) == list(iterator)
+    with pytest.raises(ValueError):
+        _create_checkpoint_pspace([0, 1, 2, 4]).resume(token)
+
+
+def test_constraint_propagation():
+    calls = []
+
+    def filter_func(x, y):
+        calls.append((x, y))
+        return x != y
+
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(3),
+        y=range(3),
+        z=range(100),
+    ).filter(filter_func)
+    assert len(list(iter(pspace))) == 600
+    assert len(calls) == 9
+    parameters = {f'p{i}': range(3) for i in range(12)}
+    pspace = PermutationSpace(list(parameters), **parameters)
+    pspace.filter_orthog(1, **{parameter: 0 for parameter in parameters})
+    permutations = list(iter(pspace))
+    assert len(permutations) == len(pspace) == 25
+    assert [pspace.index_of(p) for p in permutations] == list(range(25))
+    assert [pspace.at(i) for i in range(25)] == permutations
+    assert [p.p0 for p in pspace.iter_from({'p0': 1})] == [1, 2]
+
+
+def test_profiling():
+    calls = []
+
+    def total(x, y):
+        calls.append((x, y))
+        return x + y
+
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(3),
+        y=range(3),
+        z=range(4),
+        total=total,
+    ).filter(lambda total: total % 2 == 0)
+    with pytest.raises(ValueError):
+        pspace.profile_stats()
+    pspace.set_profiling()
+    assert len(list(iter(pspace))) == 20
+    stats = pspace.profile_stats()
+    assert stats['candidates'] == 9
+    assert stats['yielded'] == 20
+    assert stats['filters']['0: filter(total)']['evaluations'] == 9
+    assert stats['filters']['0: filter(total)']['rejections'] == 4
+    assert stats['filters']['0: filter(total)']['leaves_pruned'] == 16
+    assert stats['dependents']['total']['calls'] == len(calls) == 9
+    assert stats['dependents']['total']['hits'] == 20
+    assert '0: filter(total)' in pspace.profile_report()
+    pspace.set_profiling(False)
+    assert len(list(iter(pspace))) == 20
+    # reading lazy dependent parameters is also profiled
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=range(3),
+        y=range(3),
+        s=(lambda x, y: x + y),
+    ).set_lazy().set_profiling()
+    permutations = list(iter(pspace))
+    assert [p.s for p in permutations] == [p.s for p in permutations]
+    stats = pspace.profile_stats()['dependents']['s']
+    assert (stats['calls'], stats['hits']) == (9, 9)
+
+
+def test_async():
+    calls = []
+
+    async def offset(x):
+        calls.append(x)
+        await asyncio.sleep(0.01)
+        return 10 * x
+
+    async def run(parameters):
+        await asyncio.sleep(0.001)
+        return parameters.total
+
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=range(3),
+        y=range(4),
+        offset=offset,
+        total=(lambda offset, y: offset + y),
+    )
+    results = asyncio.run(pspace.amap(run, concurrency=12))
+    assert results == [(i, 10 * (i // 4) + i % 4) for i in range(12)]
+    assert sorted(calls) == [0, 1, 2]
+    results = asyncio.run(pspace.amap(run, concurrency=2, ordered=False))
+    assert sorted(results) == [(i, 10 * (i // 4) + i % 4) for i in range(12)]
+
+    async def collect():
+        return [parameters.total async for parameters in pspace.aiter(start={'x': 1}, skip=2)]
+
+    assert asyncio.run(collect()) == [12, 13, 20, 21, 22, 23]
+    with pytest.raises(ValueError):
+        list(pspace)
+    with pytest.raises(ValueError):
+        pspace.filter(lambda total: total > 1)
+    with pytest.raises(ValueError):
+        asyncio.run(pspace.amap(run, concurrency=0))
+
+    started = []
+
+    async def hang(parameters):
+        started.append(parameters.x)
+        await asyncio.sleep(60)
+
+    async def cancel():
+        task = asyncio.ensure_future(PermutationSpace(['x'], x=range(100)).amap(hang, concurrency=4))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert started == [0, 1, 2, 3]
+
+
+def test_iter_excluding():
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(4),
+        y=range(3),
+        z=range(5),
+    ).filter(lambda x, z: x != z)
+    permutations = list(iter(pspace))
+    completed = list(range(0, 20)) + [25, 26, 40]
+    expected = [p.index_ for p in permutations if p.index_ not in completed]
+    vectors = pspace.index_vectors([
+        {parameter: getattr(pspace.at(rank), parameter) for parameter in pspace.order}
+        for rank in completed
+    ])
+    assert [p.index_ for p in pspace.iter_excluding(vectors)] == expected
+    assert [pspace.at(p.index_) for p in pspace.iter_excluding(set(vectors))] == [pspace.at(i) for i in expected]
+    bitmap = bytearray(6)
+    for rank in completed:
+        bitmap[rank // 8] |= 1 << (rank % 8)
+    assert [p.index_ for p in pspace.iter_excluding(bytes(bitmap))] == expected
+    with pytest.raises(ValueError):
+        list(pspace.iter_excluding([(4, 0, 0)]))
+    smaller = PermutationSpace(
+        ['z', 'y', 'x'],
+        x=range(3),
+        y=range(3),
+        z=range(5),
+    ).filter(lambda x, z: x != z)
+    new_permutations = list(pspace.difference(smaller))
+    assert [p.x for p in new_permutations] == 12 * [3]
+    assert [p.index_ for p in new_permutations] == list(range(36, 48))
+    assert list(pspace.iter_excluding(smaller)) == new_permutations
+    with pytest.raises(ValueError):
+        list(pspace.difference(PermutationSpace(['x'], x=range(4))))
+    # covered prefixes are skipped without enumerating the other space
+    calls = []
+
+    def filter_func(z):
+        calls.append(z)
+        return z != 3
+
+    def create_pspace(size):
+        return PermutationSpace(
+            ['x', 'y', 'z'],
+            x=range(100),
+            y=range(100),
+            z=range(size),
+        ).filter(filter_func)
+
+    new_permutations = list(create_pspace(101).difference(create_pspace(100)))
+    assert [(p.y, p.z) for p in new_permutations[:2]] == [(0, 100), (1, 100)]
+    assert len(new_permutations) == 10000
+    assert len(calls) < 1000
+
+
+def test_export(tmp_path):
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=range(3),
+        y=list('abcd'),
+        constant=1,
+        label=(lambda x, y: f'{x}{y}'),
+    ).filter(lambda x, y: y != 'b')
+    path = str(tmp_path / 'sweep.csv')
+    assert pspace.export(path, batch_size=4) == 9
+    with open(path) as fd:
+        lines = fd.read().splitlines()
+    assert lines[0] == 'x,y,constant'
+    assert lines[1:4] == ['0,a,1', '0,c,1', '0,d,1']
+    indices = pspace.load_index(path)
+    assert list(indices) == ['x', 'y']
+    assert list(indices['x']) == [0, 0, 0, 1, 1, 1, 2, 2, 2]
+    assert list(indices['y']) == [0, 2, 3, 0, 2, 3, 0, 2, 3]
+    path = str(tmp_path / 'sweep.jsonl')
+    assert pspace.export(path, format='jsonl', columns=['label', 'x']) == 9
+    with open(path) as fd:
+        records = [json.loads(line) for line in fd]
+    assert records == [{'label': p.label, 'x': p.x} for p in pspace]
+    with pytest.raises(ValueError):
+        pspace.export(path, format='xml')
+    with pytest.raises(ValueError):
+        pspace.export(path, columns=['z'])
+    pspace.filter(lambda x: x > 0)
+    with pytest.raises(ValueError):
+        pspace.load_index(path)
+    # index files are rejected if the values of a parameter have changed
+    path = str(tmp_path / 'callable.csv')
+    assert _create_checkpoint_pspace(range(4)).export(path) == 7
+    assert list(_create_checkpoint_pspace(range(4)).load_index(path)['x']) == [0, 0, 0, 1, 1, 2, 2]
+    with pytest.raises(ValueError):
+        _create_checkpoint_pspace([0, 1, 2, 4]).load_index(path)
+    np = pytest.importorskip('numpy')
+    path = str(tmp_path / 'sweep.npz')
+    assert pspace.export(path, format='npz', dependents=True) == 6
+    arrays = np.load(path)
+    assert list(arrays['x']) == [1, 1, 1, 2, 2, 2]
+    assert list(arrays['label']) == ['1a', '1c', '1d', '2a', '2c', '2d']
+
+
+def test_sample():
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(10),
+        y=range(10),
+        z=range(10),
+    ).filter(lambda x, y: x < y)
+    permutations = set(iter(pspace))
+    sample = pspace.sample(100, seed=8)
+    assert all(pspace.at(p.index_) == p for p in sample)
+    assert len(set((p.x, p.y, p.z) for p in sample)) == 100
+    assert all(p.x < p.y for p in sample)
+    assert sample == pspace.sample(100, seed=8)
+    assert len(pspace.sample(1000, seed=8, replace=True)) == 1000
+    assert set((p.x, p.y, p.z) for p in pspace.sample(450)) == set((p.x, p.y, p.z) for p in permutations)
+    with pytest.raises(ValueError):
+        pspace.sample(451)
+    # a sparse space falls back to sampling by position
+    parameters = {f'p{i}': range(3) for i in range(12)}
+    sparse = PermutationSpace(list(parameters), **parameters)
+    sparse.filter_orthog(1, **{parameter: 0 for parameter in parameters})
+    sample = sparse.sample(25, seed=8)
+    assert len(set(p.index_ for p in sample)) == 25
+    assert all(sparse.at(p.index_) == p for p in sample)
+    assert sorted(PermutationSpace(['x'], x=range(5)).sample(5)) == list(PermutationSpace(['x'], x=range(5)))
+
+
+def test_iter_spread():
+    pspace = PermutationSpace(['x', 'y'], x=range(5), y=range(3))
+    permutations = [(p.x, p.y) for p in pspace.iter_spread()]
+    assert permutations[:4] == [(0, 0), (0, 2), (4, 0), (4, 2)]
+    assert sorted(permutations) == [(p.x, p.y) for p in pspace]
+    pspace.filter(lambda x, y: x != y)
+    permutations = list(pspace.iter_spread())
+    assert sorted(permutations) == list(iter(pspace))
+    assert all(pspace.at(p.index_) == p for p in permutations)
+
+
+def test_copy(monkeypatch):
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=range(4),
+        y=range(4),
+        total=_product,
+    ).filter(_y_is_odd)
+    permutations = list(iter(pspace))
+    copied = pspace.copy()
+    assert list(iter(copied)) == permutations
+    assert copied.cache['total'] is pspace.cache['total']
+    filtered = pspace.with_filter(lambda total: total % 2 == 0)
+    assert len(filtered) == 4
+    assert len(pspace) == 8
+    copied.set_cache_policy('none')
+    assert pspace.cache_stats()['total']['size'] == 8
+    restored = pickle.loads(pickle.dumps(pspace))
+    assert list(iter(restored)) == permutations
+    assert restored.fingerprint == pspace.fingerprint
+    assert restored.cache_stats()['total']['size'] == 8
+    assert [p for p in deepcopy(filtered)] == list(iter(filtered))
+    pspace.filter_orthog(k=1, x=1, y=1).filter_if(_x_is_zero, _y_is_odd)
+    permutations = list(iter(pspace))
+    pickled = pickle.dumps(pspace)
+    with monkeypatch.context() as patch:
+        patch.setattr('permspace.permspace.signature', None)
+        restored = pickle.loads(pickled)
+    assert list(iter(restored)) == permutations
+    assert restored.fingerprint == pspace.fingerprint
+    assert [filter_func.kind for filter_func in restored.filters] == ['filter', 'orthog', 'if']
+    with pytest.raises(ValueError):
+        PermutationSpace(['x'], x=range(2), a=(lambda b: b), b=(lambda a: a))
+
+
+def test_compiled_filters():
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=range(4),
+        y=range(4),
+        total=(lambda x, y: x + y),
+    )
+    pspace.filter(lambda *, total: total < 5)
+    pspace.filter_if((lambda x: x == 0), (lambda total, y: total == y))
+    pspace.filter_orthog(k=1, x=1, y=1)
+    assert [(p.x, p.y) for p in pspace] == [(0, 1), (1, 0), (1, 1), (1, 2), (1, 3), (2, 1), (3, 1)]
+    assert len(pspace) == 7
+
+
+def test_arrays():
+    numpy = pytest.importorskip('numpy')
+    pspace = PermutationSpace(
+        ['x', 'y', 'z'],
+        x=range(6),
+        y=[0.1, 0.2, 0.3],
+        z=list('abcd'),
+        name=(lambda x, z: f'{x}{z}'),
+    )
+    pspace.filter_array(lambda x, y: (x * y) < 1)
+    pspace.filter_orthog(k=1, x=0, z='a')
+    pspace.filter(lambda name: name != '1a')
+    permutations = list(iter(pspace))
+    batches = list(pspace.iter_batches(batch_size=10, dependents=True))
+    assert len(batches) > 1
+    arrays = pspace.to_arrays(dependents=True)
+    assert list(arrays['index_']) == list(range(len(pspace)))
+    assert list(arrays['x']) == [p.x for p in permutations]
+    assert list(arrays['y']) == [p.y for p in permutations]
+    assert list(arrays['z']) == [p.z for p in permutations]
+    assert list(arrays['name']) == [p.name for p in permutations]
+    assert numpy.concatenate([batch['index_'] for batch in batches]).tolist() == list(range(len(pspace)))
+    # values keep their types, and orthog filters compare them as scalars do
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=[1, 'a'],
+        y=[(1, 2), (3, 4)],
+    )
+    pspace.filter_orthog(k=0, x=1)
+    pspace.filter_orthog(k=1, y=(1, 2))
+    arrays = pspace.to_arrays()
+    assert list(arrays['x']) == [p.x for p in pspace] == [1, 1]
+    assert list(arrays['y']) == [p.y for p in pspace] == [(1, 2), (3, 4)]
+
+
+def test_records():
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=range(2),
+        y=list('ab'),
+        name=(lambda x, y: f'{x}{y}'),
+        constant=0,
+    )
+    namespace = pspace.at(1)
+    assert namespace.pspace_ is pspace
+    assert not hasattr(namespace, '__dict__')
+    assert str(namespace) == "Namespace(index_=1, x=0, y='b', constant=0, name='0b')"
+    assert namespace.uniqstr_ == 'x=0,y=b'
+    assert dict(namespace.items()) == {'x': 0, 'y': 'b', 'constant': 0, 'name': '0b'}
+    pspace.set_record_type('tuple')
+    assert list(pspace)[1] == (0, 'b', 0, '0b')
+    pspace.set_record_type('dict')
+    assert pspace.at(3) == {'x': 1, 'y': 'b', 'constant': 0, 'name': '1b'}
+    with pytest.raises(ValueError):
+        pspace.set_record_type('list')
+
+
+def test_index_vectors():
+    pspace = PermutationSpace(
+        ['x', 'y'],
+        x=[[1], [2], [3]],
+        y=list('abcd'),
+    )
+    assert pspace.index_vectors([{'x': [2], 'y': 'd'}, {'y': 'b'}]) == [(1, 3), (0, 1)]
+    assert len(list(pspace.iter_from({'x': [3], 'y': 'c'}))) == 2
+    with pytest.raises(ValueError):
+        pspace.index_vectors([{'y': 'e'}])
+    with pytest.raises(ValueError):
+        pspace.index_vectors([{'x': [4]}])
+    with pytest.raises(ValueError):
+        pspace.filter_orthog(y='z')